@@ -1,13 +1,16 @@
 from uuid import uuid4, UUID
 from hashlib import sha256
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import wraps
 
 from aiohttp.typedefs import Handler
 from aiohttp.web_request import Request
 from aiohttp.web_response import Response
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from config import ADMIN_TOKEN, TOKENS_MAX_AGE
 from models import Token
 
 def hash_password(password: str):
@@ -18,7 +21,26 @@ def check_password(user_password: str, hashed_password: str):
     password, salt = hashed_password.split(':', 1)
     return password == sha256((user_password + salt).encode()).hexdigest()
 
+def optional_user_id(request: Request) -> UUID | None:
+    auth_token = request.headers.get('Authorization')
+    if not auth_token:
+        return None
+
+    try:
+        auth_token = UUID(hex=auth_token.split()[-1])
+    except ValueError:
+        return None
+
+    session: Session = request.app.get('session')
+
+    return session.scalar(select(Token.user_id).where(
+        Token.id == auth_token,
+        Token.active == True,
+        Token.created_at > datetime.now() - timedelta(seconds=TOKENS_MAX_AGE)
+    ))
+
 def auth_required(handler: Handler):
+    @wraps(handler)
     async def wrapper(request: Request):
         auth_token = request.headers.get('Authorization')
 
@@ -39,4 +61,13 @@ def auth_required(handler: Handler):
 
         return await handler(request)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
+def admin_required(handler: Handler):
+    @wraps(handler)
+    async def wrapper(request: Request):
+        if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+            return Response(status=403, reason="FORBIDDEN")
+
+        return await handler(request)
+
+    return wrapper
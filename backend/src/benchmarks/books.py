@@ -0,0 +1,135 @@
+from base64 import b64encode
+from random import Random
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+
+from benchmarks.dataset import WORDS
+
+CYRILLIC_WORDS = (
+    'дерево книга страница ветка история читатель писатель ночь река камень '
+    'свет лес город старый новый море ветер огонь тихий дверь окно дорога письмо'
+).split()
+
+class SyntheticBook(NamedTuple):
+    name: str
+    kind: str
+    data: bytes
+    encoding: str
+    text: str
+    cover: bytes | None
+
+class BookGenerator:
+
+    def __init__(
+        self,
+        size: int = 100000,
+        paragraph_length: int = 400,
+        depth: int = 2,
+        sections: int = 3,
+        binaries: int = 1,
+        binary_size: int = 50000,
+        cyrillic: bool = False,
+        seed: int = 0
+    ):
+        self.size = size
+        self.paragraph_length = paragraph_length
+        self.depth = depth
+        self.sections = sections
+        self.binaries = binaries
+        self.binary_size = binary_size
+        self.words = WORDS + CYRILLIC_WORDS if cyrillic else WORDS
+        self.rng = Random(seed)
+        self.text: list[str] = []
+        self.cover: bytes | None = None
+
+    def sentence(self) -> str:
+        return ' '.join(self.rng.choice(self.words) for _ in range(self.rng.randint(4, 16))).capitalize() + '.'
+
+    def paragraph(self) -> str:
+        sentences = []
+        length = 0
+        target = max(int(self.rng.gauss(self.paragraph_length, self.paragraph_length / 4)), 1)
+        while length < target:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        return ' '.join(sentences)
+
+    def paragraphs(self, size: int) -> list[str]:
+        result = []
+        length = 0
+        while length < size:
+            paragraph = self.paragraph()
+            result.append(paragraph)
+            length += len(paragraph) + 1
+        return result
+
+    def txt(self) -> str:
+        text = '\n'.join(self.paragraphs(self.size))
+        self.text.append(text)
+        return text
+
+    def fb2(self) -> str:
+        images = [self.rng.randbytes(self.binary_size) for _ in range(self.binaries)]
+        binaries = [(f'image{i}.jpg', b64encode(image).decode()) for i, image in enumerate(images)]
+        self.cover = images[0] if images else None
+        cover = (
+            f'<coverpage><image l:href="#{binaries[0][0]}"/></coverpage>' if binaries else ''
+        )
+
+        leaves = self.sections ** self.depth if self.depth else 1
+        body = self.section(self.depth, max(self.size // leaves, 1))
+
+        return (
+            '<?xml version="1.0"?>\n'
+            '<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" xmlns:l="http://www.w3.org/1999/xlink">'
+            '<description><title-info>'
+            f'<book-title>{escape(self.paragraph()[:80])}</book-title>{cover}'
+            '</title-info></description>'
+            f'<body>{body}</body>'
+            + ''.join(f'<binary id="{name}" content-type="image/jpeg">{data}</binary>' for name, data in binaries)
+            + '</FictionBook>'
+        )
+
+    def section(self, depth: int, leaf_size: int) -> str:
+        title = self.paragraph()[:60]
+        self.text.append(title)
+        title = f'<title><p>{escape(title)}</p></title>'
+        if depth == 0:
+            paragraphs = self.paragraphs(leaf_size)
+            self.text.extend(paragraphs)
+            content = ''.join(self.inline(paragraph) for paragraph in paragraphs)
+        else:
+            content = ''.join(self.section(depth - 1, leaf_size) for _ in range(self.sections))
+        return f'<section>{title}{content}</section>'
+
+    def inline(self, paragraph: str) -> str:
+        words = escape(paragraph).split(' ')
+        if len(words) > 4 and self.rng.random() < 0.3:
+            start = self.rng.randrange(len(words) - 2)
+            words[start] = '<emphasis>' + words[start]
+            words[start + 1] = words[start + 1] + '</emphasis>'
+        return '<p>' + ' '.join(words) + '</p>\n'
+
+    def book(self, name: str, kind: str, encoding: str = 'utf-8') -> SyntheticBook:
+        self.text, self.cover = [], None
+        text = self.fb2() if kind == 'fb2' else self.txt()
+        if kind == 'fb2':
+            text = text.replace('<?xml version="1.0"?>', f'<?xml version="1.0" encoding="{encoding}"?>', 1)
+        return SyntheticBook(name, kind, text.encode(encoding), encoding, ''.join(self.text), self.cover)
+
+def corpus(scale: float = 1.0, seed: int = 0) -> list[SyntheticBook]:
+    def size(base: int) -> int:
+        return max(int(base * scale), 1)
+
+    return [
+        BookGenerator(size=size(20000), seed=seed).book('txt-small', 'txt'),
+        BookGenerator(size=size(2000000), seed=seed).book('txt-large', 'txt'),
+        BookGenerator(size=size(500000), paragraph_length=5000, seed=seed).book('txt-long-paragraphs', 'txt'),
+        BookGenerator(size=size(500000), cyrillic=True, seed=seed).book('txt-cp1251', 'txt', 'cp1251'),
+        BookGenerator(size=size(20000), binaries=0, seed=seed).book('fb2-small', 'fb2'),
+        BookGenerator(size=size(2000000), depth=2, seed=seed).book('fb2-large', 'fb2'),
+        BookGenerator(size=size(500000), depth=6, sections=2, seed=seed).book('fb2-deep', 'fb2'),
+        BookGenerator(size=size(200000), binaries=8, binary_size=size(500000), seed=seed).book('fb2-binaries', 'fb2'),
+        BookGenerator(size=size(500000), cyrillic=True, seed=seed).book('fb2-cp1251', 'fb2', 'cp1251'),
+    ]
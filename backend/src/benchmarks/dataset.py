@@ -0,0 +1,204 @@
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from math import gcd
+from random import Random
+from typing import Iterable, Iterator
+from uuid import UUID
+
+from sqlalchemy import create_engine, insert, event
+from sqlalchemy.engine import Engine
+
+from auth import hash_password
+from models import Base, User, Book, Page, Like, Genre
+
+BENCHMARK_PASSWORD = 'benchmark1'
+BATCH_SIZE = 10000
+
+USER, BOOK, PAGE, GENRE = 1, 2, 3, 4
+
+GENRES = [
+    'Fantasy', 'Science fiction', 'Detective', 'Thriller', 'Romance', 'Horror',
+    'Adventure', 'Historical', 'Poetry', 'Drama', 'Comedy', 'Fairy tale'
+]
+
+WORDS = (
+    'the a of and to in tree book page branch story reader writer night river '
+    'stone light dark forest city old new long short sea wind fire quiet loud '
+    'door window road letter voice dream morning evening winter summer'
+).split()
+
+def entity_id(kind: int, index: int) -> UUID:
+    return UUID(int=(kind << 96) | (index + 1))
+
+def username(index: int) -> str:
+    return f'user{index}'
+
+def zipf_index(n: int, s: float, rng: Random) -> int:
+    u = rng.random()
+    if abs(s - 1.0) < 1e-9:
+        rank = n ** u
+    else:
+        rank = ((n ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))
+    return min(int(rank) - 1, n - 1)
+
+def scatter(n: int) -> int:
+    stride = 2654435761 % n or 1
+    while gcd(stride, n) != 1:
+        stride += 1
+    return stride
+
+def sentence(rng: Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def batched(rows: Iterable[dict], size: int = BATCH_SIZE) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class DatasetGenerator:
+
+    def __init__(
+        self,
+        users: int = 1000,
+        books: int = 2000,
+        pages_per_book: int = 50,
+        branching: float = 0.2,
+        page_length: int = 1500,
+        likes: int = 100000,
+        zipf_s: float = 1.1,
+        seed: int = 0
+    ):
+        self.users = users
+        self.books = books
+        self.pages_per_book = pages_per_book
+        self.branching = branching
+        self.page_length = page_length
+        self.likes = likes
+        self.zipf_s = zipf_s
+        self.seed = seed
+        self.start = datetime.now() - timedelta(days=365)
+
+    @property
+    def pages(self) -> int:
+        return self.books * self.pages_per_book
+
+    def page_index(self, book: int, position: int) -> int:
+        return book * self.pages_per_book + position
+
+    def timestamp(self, index: int, total: int) -> datetime:
+        return self.start + timedelta(days=365) * (index / max(total, 1))
+
+    def generate(self, engine: Engine):
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for table, rows in (
+                (Genre, self.genre_rows()),
+                (User, self.user_rows()),
+                (Book, self.book_rows()),
+                (Page, self.page_rows()),
+                (Like, self.like_rows()),
+            ):
+                statement = insert(table).prefix_with('OR IGNORE')
+                for batch in batched(rows):
+                    conn.execute(statement, batch)
+
+    def genre_rows(self) -> Iterator[dict]:
+        for i, name in enumerate(GENRES):
+            yield {'id': entity_id(GENRE, i), 'name': name}
+
+    def user_rows(self) -> Iterator[dict]:
+        password = hash_password(BENCHMARK_PASSWORD)
+        for i in range(self.users):
+            yield {'id': entity_id(USER, i), 'username': username(i), 'password': password}
+
+    def book_rows(self) -> Iterator[dict]:
+        rng = Random(self.seed)
+        for i in range(self.books):
+            yield {
+                'id': entity_id(BOOK, i),
+                'title': sentence(rng, rng.randint(1, 6))[:100],
+                'author_id': entity_id(USER, rng.randrange(self.users)),
+                'genre_id': entity_id(GENRE, rng.randrange(len(GENRES))),
+                'created_at': self.timestamp(i, self.books)
+            }
+
+    def page_rows(self) -> Iterator[dict]:
+        rng = Random(self.seed + 1)
+        words = max(self.page_length // 6, 1)
+        texts = [sentence(rng, words)[:Page.MAX_LENGTH] for _ in range(256)]
+        for book in range(self.books):
+            created_at = self.timestamp(book, self.books)
+            latest = 0
+            parents = [0]
+            for position in range(self.pages_per_book):
+                previous = None
+                if position:
+                    parent = rng.choice(parents) if rng.random() < self.branching else latest
+                    previous = entity_id(PAGE, self.page_index(book, parent))
+
+                row = {
+                    'id': entity_id(PAGE, self.page_index(book, position)),
+                    'text': rng.choice(texts),
+                    'book_id': entity_id(BOOK, book),
+                    'first': position == 0,
+                    'last': position > 0 and rng.random() < 0.02,
+                    'previous_page_id': previous,
+                    'author_id': entity_id(USER, rng.randrange(self.users)),
+                    'created_at': created_at + timedelta(minutes=position)
+                }
+                if position and not row['last']:
+                    parents.append(position)
+                    latest = position
+                yield row
+
+    def like_rows(self) -> Iterator[dict]:
+        rng = Random(self.seed + 2)
+        none = UUID(int=0)
+        book_stride, page_stride = scatter(self.books), scatter(self.pages)
+        for _ in range(self.likes):
+            user = entity_id(USER, rng.randrange(self.users))
+            if rng.random() < 0.5:
+                book = zipf_index(self.books, self.zipf_s, rng) * book_stride % self.books
+                yield {'user_id': user, 'book_id': entity_id(BOOK, book), 'page_id': none}
+            else:
+                page = zipf_index(self.pages, self.zipf_s, rng) * page_stride % self.pages
+                yield {'user_id': user, 'book_id': none, 'page_id': entity_id(PAGE, page)}
+
+def fast_sqlite_engine(path: str) -> Engine:
+    engine = create_engine(f'sqlite:///{path}')
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA journal_mode=OFF')
+        dbapi_connection.execute('PRAGMA synchronous=OFF')
+
+    return engine
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Generate a synthetic treebook database.')
+    parser.add_argument('path')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--pages-per-book', type=int, default=50)
+    parser.add_argument('--branching', type=float, default=0.2)
+    parser.add_argument('--page-length', type=int, default=1500)
+    parser.add_argument('--likes', type=int, default=100000)
+    parser.add_argument('--zipf', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    DatasetGenerator(
+        users=args.users,
+        books=args.books,
+        pages_per_book=args.pages_per_book,
+        branching=args.branching,
+        page_length=args.page_length,
+        likes=args.likes,
+        zipf_s=args.zipf,
+        seed=args.seed
+    ).generate(fast_sqlite_engine(args.path))
@@ -0,0 +1,95 @@
+import json
+import shutil
+from argparse import ArgumentParser
+from os import path
+from random import Random
+from tempfile import mkdtemp
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from likes import add_like, remove_like, count_likes
+from models import User, Book, Like
+from benchmarks.dataset import DatasetGenerator, fast_sqlite_engine, entity_id, USER, BOOK
+
+def legacy_like(session: Session, user: User, book_id) -> bool:
+    if session.query(Like).filter(Like.book_id == book_id, Like.user_id == user.id).first():
+        return False
+    book = session.query(Book).filter(Book.id == book_id).first()
+    if not book:
+        return False
+    session.add(Like(book=book, user=user))
+    session.commit()
+    return True
+
+def legacy_unlike(session: Session, user: User, book_id) -> bool:
+    session.execute(Like.delete(where={'book_id': book_id.hex, 'user_id': user.id.hex}))
+    session.commit()
+    return True
+
+def current_like(session: Session, user: User, book_id) -> bool:
+    changed = add_like(session, Book, Like.book_id, user.id, book_id)
+    count_likes(session, Like.book_id, book_id)
+    session.commit()
+    return changed
+
+def current_unlike(session: Session, user: User, book_id) -> bool:
+    changed = bool(remove_like(session, Like.book_id, user.id, book_id))
+    count_likes(session, Like.book_id, book_id)
+    session.commit()
+    return changed
+
+VARIANTS = {
+    'legacy': (legacy_like, legacy_unlike),
+    'single_statement': (current_like, current_unlike)
+}
+
+def measure(source: str, like, unlike, pairs: list) -> dict:
+    target = source + '.run'
+    shutil.copyfile(source, target)
+    engine = fast_sqlite_engine(target)
+
+    statements = 0
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+
+    result = {}
+    with Session(engine) as session:
+        for name, func in (('like', like), ('unlike', unlike)):
+            statements = 0
+            started = perf_counter()
+            for user_id, book_id in pairs:
+                func(session, session.get(User, user_id), book_id)
+            elapsed = perf_counter() - started
+            result[name] = {'per_second': len(pairs) / elapsed, 'statements_per_op': statements / len(pairs)}
+
+    engine.dispose()
+    return result
+
+def run(operations: int, seed: int) -> dict:
+    generator = DatasetGenerator(users=500, books=1000, pages_per_book=2, likes=50000, seed=seed)
+    source = path.join(mkdtemp(), 'likes.db')
+    generator.generate(fast_sqlite_engine(source))
+
+    rng = Random(seed)
+    pairs = [
+        (entity_id(USER, rng.randrange(generator.users)), entity_id(BOOK, rng.randrange(generator.books)))
+        for _ in range(operations)
+    ]
+
+    results = {name: measure(source, like, unlike, pairs) for name, (like, unlike) in VARIANTS.items()}
+    for name in ('like', 'unlike'):
+        results['single_statement'][name]['speedup'] = results['single_statement'][name]['per_second'] / results['legacy'][name]['per_second']
+    return {'operations': operations, 'variants': results}
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare like/unlike throughput of the ORM flow and the single-statement flow.')
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.operations, args.seed), indent=2))
@@ -0,0 +1,238 @@
+from os import environ, makedirs, path
+from tempfile import mkdtemp
+
+environ.setdefault('TREEBOOK_STATIC_PATH', mkdtemp())
+
+import asyncio
+import json
+import socket
+from argparse import ArgumentParser
+from collections import defaultdict
+from random import Random
+from time import perf_counter
+
+import aiohttp
+from aiohttp import web
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from config import STATIC_PATH, IMAGES_FOLDER
+from main import create_app
+from querystats import setup_query_stats
+from benchmarks.dataset import BENCHMARK_PASSWORD, WORDS, username
+
+ROLES = ('reader', 'writer', 'liker', 'importer')
+DEFAULT_MIX = {'reader': 70, 'writer': 10, 'liker': 15, 'importer': 5}
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(self, client: aiohttp.ClientSession, method: str, route: str, url: str, **kwargs):
+        started = perf_counter()
+        async with client.request(method, url, **kwargs) as response:
+            body = await response.read()
+        self.latencies[route].append(perf_counter() - started)
+        if response.status >= 500:
+            self.errors[route] += 1
+        return response, body
+
+    def report(self, duration: float) -> dict:
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            routes[route] = {
+                'requests': len(values),
+                'errors': self.errors[route],
+                'throughput': len(values) / duration,
+                'mean': sum(values) / len(values),
+                'p50': percentile(values, 0.50),
+                'p90': percentile(values, 0.90),
+                'p99': percentile(values, 0.99),
+                'max': max(values)
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {'duration': duration, 'requests': total, 'throughput': total / duration, 'routes': routes}
+
+class VirtualClient:
+
+    def __init__(self, client: aiohttp.ClientSession, recorder: Recorder, rng: Random, token: str):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.headers = {'Authorization': token}
+        self.book_ids: list[str] = []
+        self.page_ids: list[str] = []
+
+    def remember(self, ids: list[str], value: str):
+        if len(ids) < 1000:
+            ids.append(value)
+        else:
+            ids[self.rng.randrange(len(ids))] = value
+
+    async def get(self, route: str, url: str, **params):
+        response, body = await self.recorder.request(self.client, 'GET', route, url, params=params)
+        return json.loads(body) if response.status == 200 else None
+
+    async def browse(self):
+        order_by = self.rng.choice(['created_at', 'title', 'likes_count'])
+        books = await self.get('GET /books', '/books', order_by=order_by, desc='1', limit='20')
+        if not books:
+            return
+        book = self.rng.choice(books)
+        self.remember(self.book_ids, book['id'])
+        await self.get('GET /book', '/book', book_id=book['id'])
+
+        page_id = book['first_page_id']
+        for _ in range(self.rng.randint(1, 10)):
+            if not page_id:
+                break
+            await self.get('GET /page', '/page', page_id=page_id)
+            self.remember(self.page_ids, page_id)
+            pages = await self.get('GET /pages', '/pages', next_for_f=page_id, order_by='likes_count', desc='1')
+            page_id = self.rng.choice(pages)['id'] if pages else None
+
+    async def reader(self):
+        await self.browse()
+
+    async def writer(self):
+        if not self.page_ids:
+            return await self.browse()
+        text = ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(20, 300)))
+        await self.recorder.request(
+            self.client, 'POST', 'POST /page', '/page',
+            data={'text': text, 'prev_page_id': self.rng.choice(self.page_ids)}, headers=self.headers
+        )
+
+    async def liker(self):
+        if not self.book_ids or not self.page_ids:
+            return await self.browse()
+        kind, ids = self.rng.choice([('book', self.book_ids), ('page', self.page_ids)])
+        method = self.rng.choice(['POST', 'DELETE'])
+        await self.recorder.request(
+            self.client, method, f'{method} /{kind}/like', f'/{kind}/like',
+            data={f'{kind}_id': self.rng.choice(ids)}, headers=self.headers
+        )
+
+    async def importer(self):
+        paragraphs = (
+            ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(20, 200))).capitalize() + '.'
+            for _ in range(self.rng.randint(10, 200))
+        )
+        form = aiohttp.FormData()
+        form.add_field('title', 'Imported ' + self.rng.choice(WORDS))
+        form.add_field('book', '\n'.join(paragraphs).encode(), filename='book.txt')
+        await self.recorder.request(
+            self.client, 'POST', 'POST /book/from_file/{file_type}', '/book/from_file/txt',
+            data=form, headers=self.headers
+        )
+
+async def login(client: aiohttp.ClientSession, index: int) -> str:
+    async with client.post('/login_user', data={'username': username(index), 'password': BENCHMARK_PASSWORD}) as response:
+        if response.status != 200:
+            raise RuntimeError(f'Login failed for {username(index)}: {response.status} {response.reason}')
+        return response.headers['Authorization']
+
+def assign_roles(concurrency: int, mix: dict[str, int]) -> list[str]:
+    total = sum(mix.values())
+    roles = []
+    for role, weight in mix.items():
+        roles.extend([role] * round(concurrency * weight / total))
+    return (roles + ['reader'] * concurrency)[:concurrency]
+
+async def run(db_path: str, duration: float, concurrency: int, users: int, mix: dict[str, int], seed: int) -> dict:
+    if concurrency > users:
+        raise ValueError('Every virtual client needs its own user, logging in again revokes the previous token')
+
+    makedirs(path.join(STATIC_PATH, IMAGES_FOLDER), exist_ok=True)
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    setup_query_stats(engine)
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+
+    with Session(engine) as session:
+        runner = web.AppRunner(create_app(session), access_log=None)
+        await runner.setup()
+        await web.SockSite(runner, sock).start()
+
+        recorder = Recorder()
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(f'http://127.0.0.1:{port}', connector=connector) as client:
+            rng = Random(seed)
+            actors = []
+            for i, role in enumerate(assign_roles(concurrency, mix)):
+                token = await login(client, i)
+                actors.append((VirtualClient(client, recorder, Random(rng.random()), token), role))
+
+            started = perf_counter()
+            deadline = started + duration
+
+            async def drive(actor: VirtualClient, role: str):
+                while perf_counter() < deadline:
+                    await getattr(actor, role)()
+
+            await asyncio.gather(*(drive(actor, role) for actor, role in actors))
+            elapsed = perf_counter() - started
+
+        await runner.cleanup()
+
+    report = recorder.report(elapsed)
+    report['concurrency'] = concurrency
+    report['mix'] = mix
+    return report
+
+def compare(report: dict, baseline: dict) -> dict:
+    changes = {}
+    for route, stats in report['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if not before:
+            continue
+        changes[route] = {
+            metric: (stats[metric] - before[metric]) / before[metric] if before[metric] else None
+            for metric in ('throughput', 'p50', 'p90', 'p99')
+        }
+    return changes
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(','):
+        role, weight = part.split('=')
+        if role not in ROLES:
+            raise ValueError(f'Unknown role {role}')
+        mix[role] = int(weight)
+    return mix
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Drive the treebook app in-process with a concurrent client mix.')
+    parser.add_argument('db', help='database produced by benchmarks.dataset; writers modify it')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--users', type=int, default=1000, help='number of users in the dataset')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='previous JSON report to compare against')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.db, args.duration, args.concurrency, args.users, args.mix, args.seed))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['compared_to_baseline'] = compare(report, json.load(file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
@@ -0,0 +1,122 @@
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from hashlib import sha256
+from statistics import median
+from time import perf_counter
+from typing import Callable
+
+from models import Page
+from parsers import BookParser, StringBookParser, FB2BookParser
+from benchmarks.books import SyntheticBook, corpus
+
+IMPLEMENTATIONS: dict[str, dict[str, type[BookParser]]] = {
+    'txt': {'string': StringBookParser},
+    'fb2': {'etree': FB2BookParser},
+}
+
+def timed(func: Callable, repeat: int) -> tuple[float, object]:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = perf_counter()
+        result = func()
+        timings.append(perf_counter() - started)
+    return median(timings), result
+
+def peak_memory(book: SyntheticBook, ParserType: type[BookParser]) -> int:
+    tracemalloc.start()
+    try:
+        parser = ParserType.from_bytes(book.data, book.encoding)
+        parser.get_text(Page.MAX_LENGTH)
+        parser.get_cover()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def digest(pages: list[str] | None) -> str:
+    return sha256('\x00'.join(pages or []).encode()).hexdigest()
+
+def visible(text: str) -> str:
+    return ''.join(text.split())
+
+def check(book: SyntheticBook, name: str, pages: list[str] | None, cover) -> list[str]:
+    problems = []
+    if visible(''.join(pages or [])) != visible(book.text):
+        problems.append(f'{book.name}: {name} pages do not match the generated text')
+    if (cover[0] if cover else None) != book.cover:
+        problems.append(f'{book.name}: {name} cover does not match the generated image')
+    if any(len(page) > Page.MAX_LENGTH for page in pages or []):
+        problems.append(f'{book.name}: {name} produced a page longer than {Page.MAX_LENGTH}')
+    return problems
+
+def measure(book: SyntheticBook, ParserType: type[BookParser], repeat: int) -> tuple[dict, list[str] | None, object]:
+    from_bytes, parser = timed(lambda: ParserType.from_bytes(book.data, book.encoding), repeat)
+    get_text, pages = timed(lambda: parser.get_text(Page.MAX_LENGTH), repeat)
+    get_cover, cover = timed(parser.get_cover, repeat)
+
+    return {
+        'from_bytes': from_bytes,
+        'get_text': get_text,
+        'get_cover': get_cover,
+        'peak_memory': peak_memory(book, ParserType),
+        'pages': len(pages or []),
+        'longest_page': max((len(page) for page in pages or []), default=0),
+        'cover_size': len(cover[0]) if cover else 0,
+        'digest': digest(pages)
+    }, pages, cover
+
+def run(scale: float, repeat: int, seed: int) -> dict:
+    results = {}
+    mismatches = []
+    for book in corpus(scale, seed):
+        results[book.name] = {'size': len(book.data), 'encoding': book.encoding, 'implementations': {}}
+        for name, ParserType in IMPLEMENTATIONS[book.kind].items():
+            stats, pages, cover = measure(book, ParserType, repeat)
+            results[book.name]['implementations'][name] = stats
+            mismatches.extend(check(book, name, pages, cover))
+
+    return {'scale': scale, 'seed': seed, 'books': results, 'mismatches': mismatches}
+
+def compare(report: dict, baseline: dict) -> dict:
+    changes = {}
+    for book, result in report['books'].items():
+        before_book = baseline.get('books', {}).get(book)
+        if not before_book:
+            continue
+        for name, stats in result['implementations'].items():
+            before = before_book['implementations'].get(name)
+            if not before:
+                continue
+            if stats['digest'] != before['digest']:
+                report['mismatches'].append(f'{book}: {name} pages differ from baseline')
+            changes[f'{book}/{name}'] = {
+                metric: (stats[metric] - before[metric]) / before[metric] if before[metric] else None
+                for metric in ('from_bytes', 'get_text', 'get_cover', 'peak_memory')
+            }
+    return changes
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Time and check book parsers against a synthetic corpus.')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for corpus book sizes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', help='previous JSON report; page digests must match it')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = run(args.scale, args.repeat, args.seed)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['compared_to_baseline'] = compare(report, json.load(file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+    sys.exit(1 if report['mismatches'] else 0)
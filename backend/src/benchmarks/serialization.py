@@ -0,0 +1,75 @@
+import json
+from argparse import ArgumentParser
+from datetime import datetime
+from json import dumps
+from os import path
+from tempfile import mkdtemp
+from time import perf_counter
+
+from sqlalchemy.orm import Session
+
+from models import Book
+from serializers import RowEncoder, encoder_for, orjson
+from benchmarks.dataset import DatasetGenerator, fast_sqlite_engine
+
+def normalize(value: object) -> object:
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+def legacy(rows) -> bytes:
+    return dumps([row._asdict() for row in rows], default=str).encode()
+
+def best_of(func, rows, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = perf_counter()
+        func(rows)
+        best = min(best, perf_counter() - started)
+    return best
+
+def run(rows_count: int, repeat: int, seed: int) -> dict:
+    engine = fast_sqlite_engine(path.join(mkdtemp(), 'serialization.db'))
+    DatasetGenerator(users=100, books=rows_count, pages_per_book=1, likes=rows_count * 5, seed=seed).generate(engine)
+
+    with Session(engine) as session:
+        statement = Book.select(order_by='likes_count', desc_=True, limit=rows_count)
+        result = session.execute(statement)
+        keys = list(result.keys())
+        rows = result.all()
+
+    columns = list(zip(keys, (column.type for column in statement.selected_columns)))
+    encoders = {'legacy': legacy, 'python': RowEncoder(columns, accelerated=False).encode_rows}
+    if orjson is not None:
+        encoders['orjson'] = RowEncoder(columns, accelerated=True).encode_rows
+
+    reference = normalize(json.loads(legacy(rows)))
+    results = {}
+    for name, encode in encoders.items():
+        decoded = normalize(json.loads(encode(rows)))
+        results[name] = {
+            'seconds': best_of(encode, rows, repeat),
+            'bytes': len(encode(rows)),
+            'same_output': decoded == reference
+        }
+
+    for name, result in results.items():
+        result['speedup'] = results['legacy']['seconds'] / result['seconds']
+
+    return {'rows': len(rows), 'default_backend': 'orjson' if encoder_for(statement, keys).accelerated else 'python', 'encoders': results}
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare JSON encoding of a /books page across serializers.')
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.repeat, args.seed), indent=2))
@@ -1,12 +1,96 @@
 from datetime import datetime, timedelta
+from time import monotonic, sleep, time
 
+from sqlalchemy import delete, select, exists, literal_column, Engine
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
-from sqlalchemy import delete, or_
 
-from periodic import periodic
-from models import Token
+from config import TOKENS_CLEANUP_BATCH, TOKENS_CLEANUP_BUDGET, TOKENS_CLEANUP_PAUSE, TOKENS_MAX_AGE, CHANGES_COMPACTION_BATCH
+from models import Token, Change
+from storage import ImageStorage
+from variants import VariantGenerator
 
-@periodic(3600)
-def tokens_cleanup(session: Session):
-    session.execute(delete(Token).where(or_(Token.active == False, Token.created_at < datetime.now() - timedelta(hours=5))))
-    session.commit()
\ No newline at end of file
+ROWID = literal_column('rowid')
+
+class TokensCleanup:
+
+    def __init__(
+        self,
+        batch_size: int = TOKENS_CLEANUP_BATCH,
+        budget: float = TOKENS_CLEANUP_BUDGET,
+        pause: float = TOKENS_CLEANUP_PAUSE,
+        max_age: float = TOKENS_MAX_AGE
+    ):
+        self.batch_size = batch_size
+        self.budget = budget
+        self.pause = pause
+        self.max_age = max_age
+        self.deleted = 0
+        self.batches = 0
+        self.last_deleted = 0
+        self.last_complete = True
+        self.last_run_at: float | None = None
+
+    def delete_batch(self, session: Session, predicate) -> int:
+        batch = select(ROWID).select_from(Token).where(predicate).limit(self.batch_size)
+        deleted = session.execute(delete(Token).where(ROWID.in_(batch.scalar_subquery()))).rowcount
+        session.commit()
+        self.batches += 1
+        return deleted
+
+    def __call__(self, engine: Engine) -> bool:
+        deadline = monotonic() + self.budget
+        cutoff = datetime.now() - timedelta(seconds=self.max_age)
+        deleted = 0
+        complete = True
+
+        with Session(engine) as session:
+            for predicate in (Token.created_at < cutoff, Token.active == False):
+                while complete:
+                    count = self.delete_batch(session, predicate)
+                    deleted += count
+                    if count < self.batch_size:
+                        break
+                    if monotonic() >= deadline:
+                        complete = False
+                        break
+                    sleep(self.pause)
+
+        self.deleted += deleted
+        self.last_deleted = deleted
+        self.last_complete = complete
+        self.last_run_at = time()
+        return complete
+
+    def as_dict(self) -> dict:
+        return {
+            'deleted': self.deleted,
+            'batches': self.batches,
+            'last_deleted': self.last_deleted,
+            'last_complete': self.last_complete,
+            'last_run_at': self.last_run_at
+        }
+
+tokens_cleanup = TokensCleanup()
+
+def changes_compaction(engine: Engine, batch_size: int = CHANGES_COMPACTION_BATCH) -> int:
+    newer = aliased(Change)
+    superseded = (
+        select(Change.id)
+        .where(exists().where(newer.kind == Change.kind, newer.entity_id == Change.entity_id, newer.id > Change.id))
+        .limit(batch_size)
+    )
+
+    deleted = 0
+    with Session(engine) as session:
+        while True:
+            count = session.execute(delete(Change).where(Change.id.in_(superseded.scalar_subquery()))).rowcount
+            session.commit()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+def images_cleanup(engine: Engine, storage: ImageStorage, variants: VariantGenerator):
+    with Session(engine) as session:
+        for image in storage.collect_garbage(session):
+            variants.remove(variants.key(image))
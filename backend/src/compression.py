@@ -0,0 +1,121 @@
+import asyncio
+import zlib
+from collections import OrderedDict
+from hashlib import blake2b
+
+from aiohttp import web
+from aiohttp.typedefs import Handler
+from aiohttp.web_request import Request
+from aiohttp.web_response import Response, StreamResponse
+
+from config import COMPRESSION_MIN_SIZE, COMPRESSION_CACHE_SIZE, COMPRESSION_EXECUTOR_SIZE, COMPRESSION_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+def gzip_compress(data: bytes) -> bytes:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def brotli_compress(data: bytes) -> bytes:
+    return brotli.compress(data, quality=COMPRESSION_LEVEL)
+
+COMPRESSORS = {'gzip': gzip_compress}
+if brotli is not None:
+    COMPRESSORS = {'br': brotli_compress, **COMPRESSORS}
+
+def negotiate(accept_encoding: str) -> str | None:
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+
+    for coding in COMPRESSORS:
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+class ResponseCompressor:
+
+    def __init__(self, min_size: int = COMPRESSION_MIN_SIZE, cache_size: int = COMPRESSION_CACHE_SIZE):
+        self.min_size = min_size
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+        self._cached_bytes = 0
+
+    def compressible(self, response: StreamResponse) -> bool:
+        return (
+            type(response) is Response
+            and not response.prepared
+            and response.status == 200
+            and isinstance(response.body, bytes)
+            and len(response.body) >= self.min_size
+            and 'Content-Encoding' not in response.headers
+            and response.content_type.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    @web.middleware
+    async def middleware(self, request: Request, handler: Handler) -> StreamResponse:
+        response = await handler(request)
+
+        if not self.compressible(response):
+            return response
+
+        response.headers.add('Vary', 'Accept-Encoding')
+
+        coding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        compressed = await self.compress(response.body, coding)
+        if len(compressed) >= len(response.body):
+            return response
+
+        response.body = compressed
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    async def compress(self, body: bytes, coding: str) -> bytes:
+        key = (blake2b(body, digest_size=16).digest(), coding)
+
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return compressed
+
+        self.misses += 1
+        if len(body) >= COMPRESSION_EXECUTOR_SIZE:
+            compressed = await asyncio.get_running_loop().run_in_executor(None, COMPRESSORS[coding], body)
+        else:
+            compressed = COMPRESSORS[coding](body)
+
+        self._store(key, compressed)
+        return compressed
+
+    def _store(self, key: tuple[bytes, str], compressed: bytes):
+        if len(compressed) > self.cache_size:
+            return
+
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._cached_bytes -= len(previous)
+
+        self._cache[key] = compressed
+        self._cached_bytes += len(compressed)
+        while self._cached_bytes > self.cache_size:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
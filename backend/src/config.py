@@ -1,7 +1,88 @@
-from os import path
+from os import path, environ
 
 self_path = path.dirname(__file__)
 
-DB_PATH = path.normpath(path.join(self_path, path.pardir, 'db', 'treebook.db'))
-STATIC_PATH = path.normpath(path.join(self_path, path.pardir, 'static'))
+DB_PATH = environ.get('TREEBOOK_DB_PATH', path.normpath(path.join(self_path, path.pardir, 'db', 'treebook.db')))
+STATIC_PATH = environ.get('TREEBOOK_STATIC_PATH', path.normpath(path.join(self_path, path.pardir, 'static')))
 IMAGES_FOLDER = 'user_images'
+
+SLOW_QUERY_THRESHOLD = float(environ.get('TREEBOOK_SLOW_QUERY_THRESHOLD', 0.1))
+QUERY_BUDGET_STRICT = environ.get('TREEBOOK_QUERY_BUDGET_STRICT') == '1'
+
+ADMIN_TOKEN = environ.get('TREEBOOK_ADMIN_TOKEN')
+
+PROFILE_SAMPLE_RATE = int(environ.get('TREEBOOK_PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL = 0.005
+PROFILE_HEADER = 'X-Profile'
+
+WATCHDOG_THRESHOLD = float(environ.get('TREEBOOK_WATCHDOG_THRESHOLD', 0.1))
+WATCHDOG_INTERVAL = 0.05
+
+STREAM_BATCH_SIZE = 500
+STREAM_MAX_LIMIT = None
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_EXECUTOR_SIZE = 256 * 1024
+COMPRESSION_CACHE_SIZE = 64 * 1024 * 1024
+COMPRESSION_LEVEL = 5
+
+IMAGE_MAX_SIZE = 8 * 1024 * 1024
+UPLOAD_FLUSH_SIZE = 256 * 1024
+
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMAGE_FALLBACK_CACHE_CONTROL = 'public, max-age=60'
+IMAGES_ACCEL_REDIRECT = environ.get('TREEBOOK_IMAGES_ACCEL_REDIRECT')
+
+IMAGES_GC_INTERVAL = 86400
+IMAGES_GC_GRACE = 3600
+
+IMAGE_VARIANTS_FOLDER = 'variants'
+IMAGE_VARIANT_WIDTHS = (160, 320, 640)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = int(environ.get('TREEBOOK_IMAGE_VARIANT_WORKERS', 2))
+IMAGE_VARIANTS_EAGER = environ.get('TREEBOOK_IMAGE_VARIANTS_EAGER', '1') == '1'
+
+HOST = environ.get('TREEBOOK_HOST', '0.0.0.0')
+PORT = int(environ.get('TREEBOOK_PORT', 80))
+WORKERS = int(environ.get('TREEBOOK_WORKERS', 0))
+WORKERS_REUSE_PORT = environ.get('TREEBOOK_WORKERS_REUSE_PORT') == '1'
+WORKER_MIN_UPTIME = 1.0
+SHUTDOWN_TIMEOUT = 30.0
+LEADER_LOCK_PATH = environ.get('TREEBOOK_LEADER_LOCK_PATH', f'{DB_PATH}.leader')
+LEADER_RETRY_INTERVAL = 5.0
+
+SCHEDULER_WORKERS = 2
+SCHEDULER_JITTER = 0.1
+TOKENS_CLEANUP_INTERVAL = 3600
+TOKENS_CLEANUP_BATCH = 500
+TOKENS_CLEANUP_BUDGET = 5.0
+TOKENS_CLEANUP_PAUSE = 0.01
+TOKENS_MAX_AGE = 5 * 3600
+
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT = 15.0
+EVENTS_RETRY = 3000
+
+SYNC_LIMIT = 1000
+LIKES_LOOKUP_LIMIT = 200
+COUNT_CACHE_TTL = float(environ.get('TREEBOOK_COUNT_CACHE_TTL', 30.0))
+COUNT_CACHE_SIZE = 1000
+GENRES_REFRESH_INTERVAL = float(environ.get('TREEBOOK_GENRES_REFRESH_INTERVAL', 60.0))
+CHANGES_COMPACTION_INTERVAL = 3600
+CHANGES_COMPACTION_BATCH = 1000
+
+TRENDING_HALF_LIFE = 24 * 3600
+TRENDING_DECAY_INTERVAL = 600
+TRENDING_FLOOR = 0.01
+
+FEED_FANOUT_LIMIT = 1000
+FEED_MAX_ITEMS = 500
+FEED_BACKFILL = 20
+FEED_PAGE_SIZE = 20
+FEED_TRIM_INTERVAL = 3600
+FEED_TRIM_BATCH = 1000
+
+READING_FLUSH_INTERVAL = float(environ.get('TREEBOOK_READING_FLUSH_INTERVAL', 5.0))
+READING_FLUSH_SIZE = 1000
+READING_HISTORY_SIZE = 100
+BOOKMARKS_PAGE_SIZE = 20
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy import select, update, literal, func, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import COUNT_CACHE_TTL, COUNT_CACHE_SIZE
+from models import Base, Book, Page, Counter
+
+def counter_key(Model: type[Base], filter: str | None = None, value: UUID | None = None) -> str:
+    return Model.__tablename__ if filter is None else f'{Model.__tablename__}:{filter}={value.hex}'
+
+def counted_key(Model: type[Base], where: dict[str, str]) -> str | None:
+    if not where:
+        return counter_key(Model)
+    if len(where) != 1:
+        return None
+
+    (filter, value), = where.items()
+    if filter not in Model.__counters__:
+        return None
+    try:
+        return counter_key(Model, filter, UUID(hex=value))
+    except ValueError:
+        return None
+
+def book_counters(book_id: UUID, author_id: UUID, pages: int) -> dict[str, int]:
+    return {
+        counter_key(Book): 1,
+        counter_key(Book, 'author_id', author_id): 1,
+        counter_key(Page): pages,
+        counter_key(Page, 'book_id', book_id): pages
+    }
+
+def page_counters(book_id: UUID) -> dict[str, int]:
+    return {counter_key(Page): 1, counter_key(Page, 'book_id', book_id): 1}
+
+def bump_counters(session: Session, deltas: dict[str, int]):
+    table = Counter.__table__
+    statement = update(table).where(table.c.key == bindparam('counter_key')).values(value=table.c.value + bindparam('delta'))
+    session.execute(statement, [{'counter_key': key, 'delta': delta} for key, delta in deltas.items()])
+
+def read_counter(session: Session, Model: type[Base], key: str, where: dict[str, str]) -> int:
+    value = session.scalar(select(Counter.value).where(Counter.key == key))
+    if value is not None:
+        return value
+
+    seed = select(func.count()).select_from(Model).where(True, *(Model.__filter_options__[op](where[op]) for op in where))
+    with session.get_bind().begin() as connection:
+        connection.execute(
+            sqlite_insert(Counter)
+            .from_select(['key', 'value'], select(literal(key, Counter.key.type), seed.scalar_subquery()))
+            .on_conflict_do_nothing()
+        )
+        return connection.scalar(select(Counter.value).where(Counter.key == key))
+
+class CountCache:
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, size: int = COUNT_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._counts: OrderedDict[tuple, tuple[float, int]] = OrderedDict()
+
+    def get(self, key: tuple, compute: Callable[[], int]) -> int:
+        now = monotonic()
+        cached = self._counts.get(key)
+        if cached is not None and cached[0] > now:
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        value = compute()
+        self._counts[key] = (now + self.ttl, value)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.size:
+            self._counts.popitem(last=False)
+        return value
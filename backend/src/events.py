@@ -0,0 +1,94 @@
+import asyncio
+from collections import defaultdict, deque
+from json import dumps
+from uuid import UUID
+
+from aiohttp import web
+
+from config import EVENTS_QUEUE_SIZE
+
+COALESCED_EVENTS = {'likes'}
+
+def format_event(event: str, data: dict) -> bytes:
+    return f'event: {event}\ndata: {dumps(data, default=str)}\n\n'.encode()
+
+class Subscriber:
+
+    def __init__(self, max_events: int = EVENTS_QUEUE_SIZE):
+        self.max_events = max_events
+        self.overflowed = False
+        self.closed = False
+        self._events: deque[tuple[str, dict]] = deque()
+        self._latest: dict[tuple[str, str], dict] = {}
+        self._wakeup = asyncio.Event()
+
+    def put(self, event: str, data: dict):
+        if event in COALESCED_EVENTS:
+            self._latest[(event, str(data['id']))] = data
+        elif len(self._events) >= self.max_events:
+            self.overflowed = True
+            self._events.clear()
+            self._latest.clear()
+        else:
+            self._events.append((event, data))
+        self._wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+
+    async def get(self, timeout: float) -> list[tuple[str, dict]]:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._wakeup.clear()
+
+        events = list(self._events)
+        events.extend((event, data) for (event, _), data in self._latest.items())
+        self._events.clear()
+        self._latest.clear()
+        return events
+
+class EventBus:
+
+    def __init__(self, max_events: int = EVENTS_QUEUE_SIZE):
+        self.max_events = max_events
+        self.published = 0
+        self._topics: defaultdict[UUID, set[Subscriber]] = defaultdict(set)
+
+    def subscribe(self, topic: UUID) -> Subscriber:
+        subscriber = Subscriber(self.max_events)
+        self._topics[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, topic: UUID, subscriber: Subscriber):
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._topics[topic]
+
+    @property
+    def active(self) -> bool:
+        return bool(self._topics)
+
+    def listened(self, topic: UUID) -> bool:
+        return topic in self._topics
+
+    def publish(self, topic: UUID, event: str, data: dict):
+        for subscriber in self._topics.get(topic, ()):
+            subscriber.put(event, data)
+        self.published += 1
+
+    async def close(self, app: web.Application = None):
+        for subscribers in self._topics.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+    def as_dict(self) -> dict:
+        return {
+            'topics': len(self._topics),
+            'subscribers': sum(map(len, self._topics.values())),
+            'published': self.published
+        }
@@ -0,0 +1,101 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import select, insert, delete, update, literal, union_all, func, Engine, Row
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import FEED_FANOUT_LIMIT, FEED_MAX_ITEMS, FEED_BACKFILL, FEED_TRIM_BATCH
+from models import User, Follow, Post, FeedItem
+
+FEED_COLUMNS = ['user_id', 'author_id', 'kind', 'entity_id', 'created_at']
+
+def fans_out(author_id: UUID, limit: int = FEED_FANOUT_LIMIT):
+    return select(User.followers_count).where(User.id == author_id).scalar_subquery() <= limit
+
+def publish_post(session: Session, author_id: UUID, kind: str, entity_id: UUID):
+    created_at = datetime.now()
+    session.execute(insert(Post).values(author_id=author_id, kind=kind, entity_id=entity_id, created_at=created_at))
+
+    followers = select(
+        Follow.follower_id,
+        literal(author_id, FeedItem.author_id.type),
+        literal(kind, FeedItem.kind.type),
+        literal(entity_id, FeedItem.entity_id.type),
+        literal(created_at, FeedItem.created_at.type)
+    ).where(Follow.author_id == author_id, fans_out(author_id))
+    session.execute(insert(FeedItem).from_select(FEED_COLUMNS, followers))
+
+def follow(session: Session, follower_id: UUID, author_id: UUID) -> bool:
+    statement = sqlite_insert(Follow).values(follower_id=follower_id, author_id=author_id).on_conflict_do_nothing()
+    if not session.execute(statement).rowcount:
+        return False
+
+    session.execute(update(User).where(User.id == author_id).values(followers_count=User.followers_count + 1))
+
+    backfill = (
+        select(literal(follower_id, FeedItem.user_id.type), Post.author_id, Post.kind, Post.entity_id, Post.created_at)
+        .where(Post.author_id == author_id, fans_out(author_id))
+        .order_by(Post.created_at.desc())
+        .limit(FEED_BACKFILL)
+    )
+    session.execute(insert(FeedItem).from_select(FEED_COLUMNS, backfill))
+    return True
+
+def unfollow(session: Session, follower_id: UUID, author_id: UUID) -> bool:
+    deleted = session.execute(delete(Follow).where(Follow.follower_id == follower_id, Follow.author_id == author_id)).rowcount
+    if not deleted:
+        return False
+
+    session.execute(update(User).where(User.id == author_id).values(followers_count=User.followers_count - 1))
+    session.execute(delete(FeedItem).where(FeedItem.user_id == follower_id, FeedItem.author_id == author_id))
+    return True
+
+def read_feed(session: Session, user_id: UUID, before: datetime | None, limit: int) -> list[Row]:
+    inbox = select(FeedItem.kind, FeedItem.entity_id, FeedItem.author_id, FeedItem.created_at).where(FeedItem.user_id == user_id)
+
+    popular = (
+        select(Follow.author_id)
+        .join(User, User.id == Follow.author_id)
+        .where(Follow.follower_id == user_id, User.followers_count > FEED_FANOUT_LIMIT)
+    )
+    outbox = select(Post.kind, Post.entity_id, Post.author_id, Post.created_at).where(Post.author_id.in_(popular))
+
+    if before is not None:
+        inbox = inbox.where(FeedItem.created_at < before)
+        outbox = outbox.where(Post.created_at < before)
+
+    inbox = select(inbox.order_by(FeedItem.created_at.desc()).limit(limit).subquery())
+    outbox = select(outbox.order_by(Post.created_at.desc()).limit(limit).subquery())
+    items = union_all(inbox, outbox).subquery()
+
+    statement = (
+        select(items.c.kind, items.c.entity_id, items.c.author_id, func.max(items.c.created_at).label('created_at'))
+        .group_by(items.c.kind, items.c.entity_id)
+        .order_by(func.max(items.c.created_at).desc())
+        .limit(limit)
+    )
+    return list(session.execute(statement))
+
+def feed_trim(engine: Engine, max_items: int = FEED_MAX_ITEMS, batch_size: int = FEED_TRIM_BATCH) -> int:
+    over = select(FeedItem.user_id).group_by(FeedItem.user_id).having(func.count() > max_items)
+
+    deleted = 0
+    with Session(engine) as session:
+        for user_id in session.scalars(over).all():
+            cutoff = (
+                select(FeedItem.created_at)
+                .where(FeedItem.user_id == user_id)
+                .order_by(FeedItem.created_at.desc())
+                .offset(max_items - 1)
+                .limit(1)
+                .scalar_subquery()
+            )
+            overflow = select(FeedItem.id).where(FeedItem.user_id == user_id, FeedItem.created_at < cutoff).limit(batch_size)
+            while True:
+                count = session.execute(delete(FeedItem).where(FeedItem.id.in_(overflow.scalar_subquery()))).rowcount
+                session.commit()
+                deleted += count
+                if count < batch_size:
+                    break
+    return deleted
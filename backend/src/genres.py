@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import re
+from hashlib import sha1
+from uuid import UUID
+
+from aiohttp import web
+from sqlalchemy import select, Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import GENRES_REFRESH_INTERVAL
+from models import Genre, Counter
+from serializers import encoder_for
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'genres:version'
+
+ENTITY_TAG = re.compile(r'\s*(?:(\*|(?:W/)?"[^"]*")\s*)?(?:,|\Z)')
+
+def parse_etags(header: str) -> list[str]:
+    tags, position = [], 0
+    while position < len(header):
+        match = ENTITY_TAG.match(header, position)
+        if not match:
+            return []
+        if match.group(1):
+            tags.append(match.group(1))
+        position = match.end()
+    return tags
+
+def etag_matches(header: str, etag: str) -> bool:
+    tags = parse_etags(header)
+    return '*' in tags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in tags)
+
+def bump_genres_version(session: Session):
+    statement = sqlite_insert(Counter).values(key=VERSION_KEY, value=1)
+    session.execute(statement.on_conflict_do_update(index_elements=[Counter.key], set_={'value': Counter.value + 1}))
+
+class GenreCatalog:
+
+    def __init__(self, interval: float = GENRES_REFRESH_INTERVAL):
+        self.interval = interval
+        self.version: int | None = None
+        self.etag = 'W/""'
+        self.rows: list[bytes] = []
+        self.encoded = b'[]'
+        self.ids: set[UUID] = set()
+        self.reloads = 0
+        self._engine: Engine | None = None
+        self._task: asyncio.Task | None = None
+
+    def reload(self, session: Session):
+        version = session.scalar(select(Counter.value).where(Counter.key == VERSION_KEY))
+        statement = select(Genre.id, Genre.name)
+        result = session.execute(statement)
+        encoder = encoder_for(statement, result.keys())
+
+        ids, rows = set(), []
+        for genre in result:
+            ids.add(genre.id)
+            rows.append(encoder.encode_row(genre))
+
+        self.version = version
+        self.ids = ids
+        self.rows = rows
+        self.encoded = b'[' + b','.join(rows) + b']'
+        self.etag = 'W/"' + sha1(b','.join(rows)).hexdigest() + '"'
+        self.reloads += 1
+
+    def body(self, offset: int = 0, limit: int | None = None) -> bytes:
+        if offset == 0 and (limit is None or limit >= len(self.rows)):
+            return self.encoded
+        rows = self.rows[offset:] if limit is None else self.rows[offset:offset + limit]
+        return b'[' + b','.join(rows) + b']'
+
+    def resolve(self, genre_id: UUID) -> UUID | None:
+        return genre_id if genre_id in self.ids else None
+
+    def refresh(self):
+        with Session(self._engine) as session:
+            if session.scalar(select(Counter.value).where(Counter.key == VERSION_KEY)) != self.version:
+                self.reload(session)
+
+    async def start(self, app: web.Application):
+        self._engine = app['session'].get_bind()
+        with Session(self._engine) as session:
+            self.reload(session)
+        self._task = asyncio.create_task(self._loop(), name='genre-catalog')
+
+    async def stop(self, app: web.Application = None):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('Failed to refresh the genre catalog')
+
+    def as_dict(self) -> dict:
+        return {'version': self.version, 'genres': len(self.rows), 'etag': self.etag, 'reloads': self.reloads}
@@ -1,20 +1,38 @@
 from json import dumps
+from datetime import datetime
 from uuid import UUID, uuid4
 from typing import Type
-from os import path, remove
+from os import path
 
-from config import IMAGES_FOLDER, STATIC_PATH
+from config import IMAGES_FOLDER, STATIC_PATH, STREAM_BATCH_SIZE, STREAM_MAX_LIMIT, IMAGE_CACHE_CONTROL, IMAGE_FALLBACK_CACHE_CONTROL, IMAGES_ACCEL_REDIRECT, IMAGE_VARIANTS_EAGER, EVENTS_HEARTBEAT, EVENTS_RETRY, SYNC_LIMIT, FEED_PAGE_SIZE, BOOKMARKS_PAGE_SIZE, LIKES_LOOKUP_LIMIT
 
 from aiohttp.web_request import Request
-from aiohttp.web_response import Response
+from aiohttp.web_response import Response, StreamResponse
+from aiohttp.web_fileresponse import FileResponse
 
+from sqlalchemy import Select, Subquery, ColumnElement, select, func, and_, union_all, desc, tuple_
 from sqlalchemy.orm import Session
 
-from models import User, Token, Book, Like, Base, Page, Genre, Image
-from validators import validate_password, validate_username, validate_title, validate_page_text, safe_convert_to_uuid
-from auth import hash_password, check_password, auth_required
+from models import User, Token, Book, Like, Base, Page, Image, Change, Bookmark, HistoryEntry
+from validators import validate_password, validate_username, validate_title, validate_page_text, validate_fields, safe_convert_to_uuid
+from auth import hash_password, check_password, auth_required, admin_required, optional_user_id
 from parsers import BookParser, FB2BookParser, StringBookParser
-
+from querystats import query_budget, count_queries
+from serializers import encoder_for
+from storage import ImageStorage, UploadError, ImageTooBig, InvalidImage
+from variants import VariantGenerator
+from profiler import RouteProfiler
+from loop_watchdog import LoopWatchdog
+from scheduler import Scheduler
+from events import EventBus, format_event
+from trending import add_trending, like_weight
+from likes import add_like, remove_like, count_likes
+from counters import CountCache, counted_key, read_counter, bump_counters, book_counters, page_counters
+from genres import GenreCatalog, bump_genres_version, etag_matches
+from feed import publish_post, follow, unfollow, read_feed
+from reading import ReadingTracker
+
+@query_budget(4)
 async def register_user(request: Request) -> Response:
     params = await request.post()
 
@@ -46,6 +64,7 @@ async def register_user(request: Request) -> Response:
 
     return Response(status=201, headers={"Authorization": f"Bearer {token}"}, reason="SUCCESS")
 
+@query_budget(4)
 async def login_user(request: Request) -> Response:
     params = await request.post()
 
@@ -69,6 +88,7 @@ async def login_user(request: Request) -> Response:
 
     return Response(status=200, headers={"Authorization": f"Bearer {token}"}, reason="SUCCESS")
 
+@query_budget(15)
 @auth_required
 async def create_book(request: Request) -> Response:
 
@@ -79,82 +99,130 @@ async def create_book(request: Request) -> Response:
     title = None
     first_page_text = None
     genre_id = None
-    image = None
+    cover = None
 
-    while True:
-        field = await reader.next()
-        if not field:
-            break
+    storage: ImageStorage = request.app.get('images')
+
+    try:
+        while True:
+            field = await reader.next()
+            if not field:
+                break
         
-        if field.name == 'title':
-            title = (await field.read_chunk()).decode()
+            if field.name == 'title':
+                title = (await field.read_chunk()).decode()
         
-        if field.name == 'text':
-            first_page_text = (await field.read_chunk()).decode()
+            if field.name == 'text':
+                first_page_text = (await field.read_chunk()).decode()
         
-        if field.name == 'genre_id':
-            genre_id = (await field.read_chunk()).decode()
-
-        if field.name == 'cover':
-            filename = uuid4().hex + '.' + field.filename.split('.')[-1]
-            with open(path.join(STATIC_PATH, IMAGES_FOLDER, filename), 'wb') as file:
-                for _ in range(1000):
-                    chank = await field.read_chunk()
-                    if not chank:
-                        break
-                    file.write(chank)
-                else:
-                    file.close()
-                    remove(path.join(STATIC_PATH, IMAGES_FOLDER, filename))
-                    return Response(status=413, reason="IMAGE_TOO_BIG")
-            image = Image(path=path.join(IMAGES_FOLDER, filename))
-
-
-    if not validate_title(title):
-        return Response(status=400, reason="INVALID_TITLE")
-    
-    if not validate_page_text(first_page_text):
-        return Response(status=400, reason="INVALID_FIRST_PAGE_TEXT")
-    
-    session: Session = request.app.get('session')
+            if field.name == 'genre_id':
+                genre_id = (await field.read_chunk()).decode()
 
-    genre = session.query(Genre).filter(Genre.id == safe_convert_to_uuid(genre_id)).first()
+            if field.name == 'cover':
+                if cover:
+                    cover.discard()
+                cover = storage.spool()
+                await cover.write_field(field)
 
-    book = Book(
-        title=title,
-        author=user,
-        genre=genre,
-    )
-
-    if image:
-        session.add(image)
-        session.commit()
-        book.cover_image_id = image.id
-
-    first_page = Page(
-        text=first_page_text,
-        book=book,
-        first=True,
-        author=user
-    )
+        if not validate_title(title):
+            return Response(status=400, reason="INVALID_TITLE")
     
-    session.add(book)
-    session.add(first_page)
-    session.commit()
+        if not validate_page_text(first_page_text):
+            return Response(status=400, reason="INVALID_FIRST_PAGE_TEXT")
 
-    return Response(status=201, reason="SUCCESS", content_type='application/json', body=dumps({'book_id': str(book.id), 'first_page_id': str(first_page.id)}))
+        if cover:
+            await cover.finish()
+    
+        session: Session = request.app.get('session')
+
+        catalog: GenreCatalog = request.app.get('genres')
+
+        book = Book(
+            title=title,
+            author=user,
+            genre_id=catalog.resolve(safe_convert_to_uuid(genre_id)),
+        )
+
+        if cover:
+            image = await storage.save_spool(session, cover)
+            session.commit()
+            book.cover_image_id = image.id
+            generate_variants(request, image)
+
+        first_page = Page(
+            text=first_page_text,
+            book=book,
+            first=True,
+            author=user
+        )
+    
+        session.add(book)
+        session.add(first_page)
+        session.flush()
+        Change.record(session, (Change.BOOK, book.id), (Change.PAGE, first_page.id))
+        bump_counters(session, book_counters(book.id, book.author_id, 1))
+        publish_post(session, book.author_id, Change.BOOK, book.id)
+        session.commit()
 
+        return Response(status=201, reason="SUCCESS", content_type='application/json', body=dumps({'book_id': str(book.id), 'first_page_id': str(first_page.id)}))
+    except ImageTooBig:
+        return Response(status=413, reason="IMAGE_TOO_BIG")
+    except InvalidImage:
+        return Response(status=400, reason="INVALID_IMAGE")
+    finally:
+        if cover:
+            cover.discard()
+
+def publish_likes(request: Request, topic: UUID | None, kind: str, target_id: UUID, likes_count: int):
+    bus: EventBus = request.app.get('events')
+    if topic is not None and bus.listened(topic):
+        bus.publish(topic, 'likes', {'id': target_id, 'kind': kind, 'likes_count': likes_count})
+
+def parse_fields(request: Request) -> set[str] | None:
+    fields = request.query.get('fields')
+    return {name for name in fields.split(',') if name} if fields else None
+
+@query_budget(1)
 async def get_book(request: Request) -> Response:
     book_id = request.query.get('book_id', UUID(int=0).hex)
 
+    fields = parse_fields(request)
+    if not validate_fields(Book, fields):
+        return Response(status=400, reason="INVALID_FIELDS")
+
     session: Session = request.app.get('session')
 
-    book = session.execute(Book.select(where={'id': book_id}, limit=1)).first()
+    statement = Book.select(where={'id': book_id}, limit=1, fields=fields)
+    result = session.execute(statement)
+    book = result.first()
 
     if not book:
         return Response(status=404, reason="BOOK_NOT_FOUND")
     
-    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(book._asdict(), default=str))
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=encoder_for(statement, result.keys()).encode_row(book))
+
+def with_my_like(request: Request, Model: Type[Base], statement: Select) -> Select:
+    if request.query.get('include_my_like') != '1' or Model not in (Book, Page):
+        return statement
+
+    user_id = optional_user_id(request)
+    if user_id is None:
+        return statement
+
+    where = Like.book_id == Book.id if Model is Book else and_(Like.book_id == UUID(int=0), Like.page_id == Page.id)
+    return statement.add_columns(Like.liked_by(user_id, where).label('my_like'))
+
+def total_count(request: Request, Model: Type[Base], where: dict[str, str]) -> int:
+    where = {op: value for op, value in where.items() if op in Model.__filter_options__}
+    session: Session = request.app.get('session')
+
+    key = counted_key(Model, where) if Model.__counters__ is not None else None
+    if key is not None:
+        return read_counter(session, Model, key, where)
+
+    counts: CountCache = request.app.get('counts')
+    statement = Model.select(where=where, limit=None, max_limit=None, fields=set()).subquery()
+    return counts.get((Model.__tablename__, *sorted(where.items())), lambda: session.scalar(select(func.count()).select_from(statement)))
 
 async def get_list(request: Request, Model: Type[Base]) -> Response:
     
@@ -164,7 +232,9 @@ async def get_list(request: Request, Model: Type[Base]) -> Response:
     order_by = None
     desc_ = False
     offset = 0
-    limit = 20
+    limit = None
+    fields = parse_fields(request)
+    stream = params.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
 
     for param in params:
         if param.endswith("_f"):
@@ -178,52 +248,114 @@ async def get_list(request: Request, Model: Type[Base]) -> Response:
         elif param == 'limit' and params[param].isdecimal():
             limit = int(params[param])
 
+    if not validate_fields(Model, fields):
+        return Response(status=400, reason="INVALID_FIELDS")
+
+    headers = {'X-Total-Count': str(total_count(request, Model, where))} if params.get('count') == '1' else None
+
+    if stream:
+        statement = Model.select(where=where, order_by=order_by, desc_=desc_, offset=offset, limit=limit, max_limit=STREAM_MAX_LIMIT, fields=fields)
+        limit = Model.page_limit(limit, STREAM_MAX_LIMIT)
+        return await stream_rows(request, Model, with_my_like(request, Model, statement), order_by, desc_, offset, limit, headers)
+
     session: Session = request.app.get('session')
 
-    items = session.execute(Model.select(where=where, order_by=order_by, desc_=desc_, offset=offset, limit=limit)).all()
+    statement = Model.select(where=where, order_by=order_by, desc_=desc_, offset=offset, limit=limit or 20, fields=fields)
+    statement = with_my_like(request, Model, statement)
+    result = session.execute(statement)
+    items = result.all()
     
-    return Response(status=200, reason='SUCCESS', content_type='application/json', body=dumps([row._asdict() for row in items], default=str))
+    return Response(status=200, reason='SUCCESS', headers=headers, content_type='application/json', body=encoder_for(statement, result.keys()).encode_rows(items))
+
+def next_batch(sub: Subquery, keys: list[ColumnElement], desc_: bool, after: tuple | None, offset: int, size: int) -> Select:
+    statement = select(sub).order_by(*(desc(key) if desc_ else key for key in keys)).limit(size)
+    if after is None:
+        return statement.offset(offset)
+    return statement.where(tuple_(*keys) < after if desc_ else tuple_(*keys) > after)
+
+async def stream_rows(request: Request, Model: Type[Base], statement: Select, order_by: str | None, desc_: bool, offset: int, limit: int | None, headers: dict[str, str] | None = None) -> StreamResponse:
+    engine = request.app.get('session').get_bind()
+
+    sub = statement.order_by(None).offset(None).limit(None).subquery()
+    order_key = Model.order_key(order_by)
+    keys = [sub.c[order_key], sub.c.id] if order_key and order_key != 'id' else [sub.c.id]
+
+    response = StreamResponse(status=200, reason='SUCCESS', headers=headers)
+    response.content_type = 'application/x-ndjson'
+    response.enable_compression()
+    await response.prepare(request)
+
+    after = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_BATCH_SIZE if remaining is None else min(STREAM_BATCH_SIZE, remaining)
+        batch = next_batch(sub, keys, desc_, after, offset, size)
+
+        with count_queries(merge=after is None), engine.connect() as connection:
+            result = connection.execute(batch)
+            encoder = encoder_for(batch, result.keys())
+            rows = result.all()
+
+        if rows:
+            await response.write(b''.join(encoder.encode_row(row) + b'\n' for row in rows))
+        if len(rows) < size:
+            break
+
+        after = tuple(rows[-1]._mapping[key.key] for key in keys)
+        if remaining is not None:
+            remaining -= len(rows)
+
+    await response.write_eof()
+    return response
 
+@query_budget(5)
 async def get_books(request: Request) -> Response:
     return await get_list(request, Book)
 
-@auth_required
-async def like_book(request: Request) -> Response:
+async def set_like(request: Request, Model: Type[Book | Page], kind: str, liked: bool) -> Response:
     params = await request.post()
-    book_id = params.get('book_id', UUID(int=0).hex)
+    target_id = safe_convert_to_uuid(params.get(f'{kind}_id'))
     user: User = request.get('user')
 
-    session: Session = request.app.get('session')
-
-    if session.query(Like).filter(Like.book_id == UUID(hex=book_id), Like.user_id == user.id).first():
-        return Response(status=409, reason="BOOK_ALREADY_LIKED")
+    column, change_kind = (Like.book_id, Change.BOOK_LIKES) if Model is Book else (Like.page_id, Change.PAGE_LIKES)
 
-    book = session.query(Book).filter(Book.id == UUID(hex=book_id)).first()
-    if not book:
-        return Response(status=404, reason="BOOK_NOT_FOUND")
+    session: Session = request.app.get('session')
 
-    like = Like(
-        book=book,
-        user=user
-    )
-    
-    session.add(like)
+    if liked:
+        changed = add_like(session, Model, column, user.id, target_id)
+        delta = 1.0 if changed else 0.0
+    else:
+        removed = remove_like(session, column, user.id, target_id)
+        changed = bool(removed)
+        delta = -sum(map(like_weight, removed))
+
+    if not changed and session.scalar(select(Model.id).where(Model.id == target_id)) is None:
+        return Response(status=404, reason=f"{kind.upper()}_NOT_FOUND")
+
+    if changed:
+        add_trending(session, Model, target_id, delta)
+        Change.record(session, (change_kind, target_id))
+    likes_count = count_likes(session, column, target_id)
     session.commit()
 
-    return Response(status=200, reason="SUCCESS")
-
-@auth_required
-async def unlike_book(request: Request):
-    params = await request.post()
-    book_id = params.get('book_id', UUID(int=0).hex)
-    user: User = request.get('user')
+    bus: EventBus = request.app.get('events')
+    if changed and bus.active:
+        topic = target_id if Model is Book else session.scalar(select(Page.book_id).where(Page.id == target_id))
+        publish_likes(request, topic, kind, target_id, likes_count)
 
-    session: Session = request.app.get('session')
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps({'liked': liked, 'changed': changed, 'likes_count': likes_count}))
 
-    session.execute(Like.delete(where={'book_id': book_id, 'user_id': user.id.hex}))
+@query_budget(6)
+@auth_required
+async def like_book(request: Request) -> Response:
+    return await set_like(request, Book, 'book', True)
 
-    return Response(status=200, reason='SUCCESS')
+@query_budget(6)
+@auth_required
+async def unlike_book(request: Request) -> Response:
+    return await set_like(request, Book, 'book', False)
 
+@query_budget(10)
 @auth_required
 async def create_page(request: Request):
     user: User = request.get('user')
@@ -254,65 +386,54 @@ async def create_page(request: Request):
         previous_page=prev_page,
         last=last
     )
+    event = {'book_id': prev_page.book_id, 'previous_page_id': prev_page.id, 'author_id': user.id, 'author': user.username, 'last': last}
 
     session.add(new_page)
+    session.flush()
+    Change.record(session, (Change.PAGE, new_page.id))
+    bump_counters(session, page_counters(new_page.book_id))
+    publish_post(session, new_page.author_id, Change.PAGE, new_page.id)
     session.commit()
 
+    bus: EventBus = request.app.get('events')
+    bus.publish(event['book_id'], 'page', {'id': new_page.id, **event})
+
     return Response(status=201, reason="SUCCESS", content_type='application/json', body=dumps({'page_id': str(new_page.id)}))
 
 
+@query_budget(1)
 async def get_page(request: Request):
     page_id = request.query.get('page_id', UUID(int=0).hex)
+    fields = parse_fields(request)
+    if not validate_fields(Page, fields):
+        return Response(status=400, reason="INVALID_FIELDS")
+
     session: Session = request.app.get('session')
 
-    page = session.execute(Page.select(where={'id': page_id}, limit=1)).first()
+    statement = Page.select(where={'id': page_id}, limit=1, fields=fields)
+    result = session.execute(statement)
+    page = result.first()
 
     if not page:
         return Response(status=404, reason="PAGE_NOT_FOUND")
     
-    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(page._asdict(), default=str))
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=encoder_for(statement, result.keys()).encode_row(page))
 
+@query_budget(5)
 async def get_pages(request: Request):
     return await get_list(request, Page)
 
+@query_budget(7)
 @auth_required
 async def like_page(request: Request) -> Response:
-    params = await request.post()
-    page_id = params.get('page_id', UUID(int=0).hex)
-    user: User = request.get('user')
-
-    session: Session = request.app.get('session')
-
-    if session.query(Like).filter(Like.page_id == UUID(hex=page_id), Like.user_id == user.id).first():
-        return Response(status=409, reason="PAGE_ALREADY_LIKED")
-
-    page = session.query(Page).filter(Page.id == UUID(hex=page_id)).first()
-    if not page:
-        return Response(status=404, reason="PAGE_NOT_FOUND")
-
-    like = Like(
-        page=page,
-        user=user
-    )
-    
-    session.add(like)
-    session.commit()
-
-    return Response(status=200, reason="SUCCESS")
-
+    return await set_like(request, Page, 'page', True)
 
+@query_budget(7)
 @auth_required
-async def unlike_page(request: Request):
-    params = await request.post()
-    page_id = params.get('page_id', UUID(int=0).hex)
-    user: User = request.get('user')
-
-    session: Session = request.app.get('session')
-
-    session.execute(Like.delete(where={'page_id': page_id, 'user_id': user.id.hex}))
-
-    return Response(status=200, reason='SUCCESS')
+async def unlike_page(request: Request) -> Response:
+    return await set_like(request, Page, 'page', False)
 
+@query_budget(15)
 @auth_required
 async def create_book_from_file(request: Request) -> Response:
     parsers_map: dict[str, type[BookParser]] = {
@@ -359,11 +480,11 @@ async def create_book_from_file(request: Request) -> Response:
     if not title:
         return Response(status=400, reason="NO_TITLE")
 
-    pages = [Page(text=page_text, author=user) for page_text in parser.get_text(Page.MAX_LENGTH)]
+    pages = [Page(id=uuid4(), text=page_text, author=user) for page_text in parser.get_text(Page.MAX_LENGTH)]
     pages[0].first = True
     pages[-1].last = True
     for i in range(1, len(pages)):
-        pages[i].previous_page = pages[i - 1]
+        pages[i].previous_page_id = pages[i - 1].id
 
     book = Book(
         title=title,
@@ -371,30 +492,388 @@ async def create_book_from_file(request: Request) -> Response:
         pages=pages
     )
 
+    session: Session = request.app.get("session")
+    storage: ImageStorage = request.app.get('images')
+
     image_data = parser.get_cover()
     image = None
     if image_data:
-        image_path = path.join(IMAGES_FOLDER, f'{uuid4().hex}.{image_data[1]}')
         try:
-            with open(path.join(STATIC_PATH, image_path), 'wb') as f:
-                f.write(image_data[0])
-            image = Image(
-                path=image_path
-            )
-        except Exception as e:
-            remove(image_path)
+            image = await storage.save_bytes(session, image_data[0])
+        except (OSError, UploadError):
             image = None
 
-    session: Session = request.app.get("session")
     if image:
-        session.add(image)
         session.commit()
         book.cover_image_id = image.id
+        generate_variants(request, image)
 
     session.add(book)
+    session.flush()
+    Change.record(session, (Change.BOOK, book.id), *((Change.PAGE, page.id) for page in pages))
+    bump_counters(session, book_counters(book.id, book.author_id, len(pages)))
+    publish_post(session, book.author_id, Change.BOOK, book.id)
     session.commit()
 
     return Response(status=201, reason="SUCCESS", content_type='application/json', body=dumps({'book_id': str(book.id)}))
     
+@query_budget(0)
 async def get_genres(request: Request) -> Response:
-    return await get_list(request, Genre)
\ No newline at end of file
+    params = request.query
+    offset = int(params['offset']) if params.get('offset', '').isdecimal() else 0
+    limit = int(params['limit']) if params.get('limit', '').isdecimal() else 20
+    if limit > 200:
+        limit = 20
+
+    catalog: GenreCatalog = request.app.get('genres')
+
+    headers = {'ETag': catalog.etag, 'Cache-Control': 'no-cache'}
+    if params.get('count') == '1':
+        headers['X-Total-Count'] = str(len(catalog.rows))
+
+    if etag_matches(request.headers.get('If-None-Match', ''), catalog.etag):
+        return Response(status=304, reason="NOT_MODIFIED", headers=headers)
+
+    return Response(status=200, reason="SUCCESS", headers=headers, content_type='application/json', body=catalog.body(offset, limit))
+
+def generate_variants(request: Request, image: Image):
+    if not IMAGE_VARIANTS_EAGER:
+        return
+    storage: ImageStorage = request.app.get('images')
+    variants: VariantGenerator = request.app.get('variants')
+    variants.schedule(storage.full_path(image.path), variants.key(image))
+
+async def get_image(request: Request) -> StreamResponse:
+    name = request.match_info.get('name', '')
+    images_path = path.join(STATIC_PATH, IMAGES_FOLDER)
+    image_path = path.normpath(path.join(images_path, name))
+
+    if not image_path.startswith(images_path + path.sep):
+        return Response(status=404, reason="IMAGE_NOT_FOUND")
+
+    return image_response(images_path, image_path)
+
+@query_budget(1)
+async def get_image_variant(request: Request) -> StreamResponse:
+    width = request.query.get('w')
+    if width is not None and (not width.isdecimal() or int(width) == 0):
+        return Response(status=400, reason="INVALID_WIDTH")
+
+    session: Session = request.app.get('session')
+    image = session.get(Image, safe_convert_to_uuid(request.match_info.get('id')))
+
+    if image is None:
+        return Response(status=404, reason="IMAGE_NOT_FOUND")
+
+    storage: ImageStorage = request.app.get('images')
+    variants: VariantGenerator = request.app.get('variants')
+    image_path = storage.full_path(image.path)
+
+    if width is None:
+        return image_response(path.join(STATIC_PATH, IMAGES_FOLDER), image_path)
+
+    variant_path = await variants.get(image_path, variants.key(image), variants.pick_width(int(width))) if variants.available else None
+    if variant_path is None:
+        return image_response(path.join(STATIC_PATH, IMAGES_FOLDER), image_path, IMAGE_FALLBACK_CACHE_CONTROL)
+
+    return image_response(path.join(STATIC_PATH, IMAGES_FOLDER), variant_path)
+
+def image_response(images_path: str, image_path: str, cache_control: str = IMAGE_CACHE_CONTROL) -> StreamResponse:
+    headers = {'Cache-Control': cache_control}
+
+    if IMAGES_ACCEL_REDIRECT:
+        headers['X-Accel-Redirect'] = f"{IMAGES_ACCEL_REDIRECT.rstrip('/')}/{path.relpath(image_path, images_path)}"
+        return Response(status=200, headers=headers)
+
+    return FileResponse(image_path, headers=headers)
+
+@admin_required
+async def get_profile(request: Request) -> Response:
+    profiler: RouteProfiler = request.app.get('profiler')
+    return Response(status=200, reason="SUCCESS", content_type='text/plain', text=profiler.collapsed(request.query.get('route')))
+
+@admin_required
+async def configure_profile(request: Request) -> Response:
+    params = await request.post()
+    sample_rate = params.get('sample_rate', '')
+
+    if not sample_rate.isdecimal():
+        return Response(status=400, reason="INVALID_SAMPLE_RATE")
+
+    profiler: RouteProfiler = request.app.get('profiler')
+    profiler.sample_rate = int(sample_rate)
+
+    return Response(status=200, reason="SUCCESS")
+
+@admin_required
+async def reset_profile(request: Request) -> Response:
+    profiler: RouteProfiler = request.app.get('profiler')
+    profiler.reset()
+    return Response(status=200, reason="SUCCESS")
+
+@admin_required
+async def get_loop_stats(request: Request) -> Response:
+    watchdog: LoopWatchdog = request.app.get('watchdog')
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(watchdog.as_dict()))
+
+@admin_required
+async def reload_genres(request: Request) -> Response:
+    session: Session = request.app.get('session')
+    catalog: GenreCatalog = request.app.get('genres')
+
+    bump_genres_version(session)
+    session.commit()
+    catalog.reload(session)
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(catalog.as_dict()))
+
+@admin_required
+async def get_scheduler_stats(request: Request) -> Response:
+    scheduler: Scheduler = request.app.get('scheduler')
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(scheduler.as_dict()))
+
+@query_budget(1)
+async def get_book_events(request: Request) -> StreamResponse:
+    book_id = safe_convert_to_uuid(request.match_info.get('id'))
+    session: Session = request.app.get('session')
+
+    if session.scalar(select(Book.id).where(Book.id == book_id)) is None:
+        return Response(status=404, reason="BOOK_NOT_FOUND")
+
+    response = StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    await response.prepare(request)
+    await response.write(f'retry: {EVENTS_RETRY}\n\n'.encode())
+
+    bus: EventBus = request.app.get('events')
+    subscriber = bus.subscribe(book_id)
+    try:
+        while not subscriber.closed:
+            events = await subscriber.get(EVENTS_HEARTBEAT)
+            if subscriber.overflowed:
+                await response.write(format_event('resync', {'book_id': book_id}))
+                break
+            if events:
+                await response.write(b''.join(format_event(event, data) for event, data in events))
+            elif not subscriber.closed:
+                await response.write(b': heartbeat\n\n')
+    except ConnectionResetError:
+        pass
+    finally:
+        bus.unsubscribe(book_id, subscriber)
+
+    return response
+
+def likes_counts(session: Session, column, ids: list[UUID]) -> dict[UUID, int]:
+    if not ids:
+        return {}
+    counts = dict(session.execute(select(column, func.count()).where(column.in_(ids)).group_by(column)).all())
+    return {id: counts.get(id, 0) for id in ids}
+
+@query_budget(5)
+async def sync(request: Request) -> Response:
+    since = request.query.get('since', '0')
+    if not since.isdecimal():
+        return Response(status=400, reason="INVALID_CURSOR")
+
+    session: Session = request.app.get('session')
+
+    changes = session.execute(
+        select(Change.kind, Change.entity_id, func.max(Change.id).label('cursor'))
+        .where(Change.id > int(since))
+        .group_by(Change.kind, Change.entity_id)
+        .order_by('cursor')
+        .limit(SYNC_LIMIT + 1)
+    ).all()
+
+    more = len(changes) > SYNC_LIMIT
+    changes = changes[:SYNC_LIMIT]
+    cursor = changes[-1].cursor if changes else int(since)
+
+    ids: dict[str, list[UUID]] = {Change.BOOK: [], Change.PAGE: [], Change.BOOK_LIKES: [], Change.PAGE_LIKES: []}
+    for change in changes:
+        ids.setdefault(change.kind, []).append(change.entity_id)
+
+    parts = [f'{{"cursor":{cursor},"more":{dumps(more)}'.encode()]
+    for key, Model, kind in (('books', Book, Change.BOOK), ('pages', Page, Change.PAGE)):
+        rows = b'[]'
+        if ids[kind]:
+            statement = Model.select(limit=None, max_limit=None).where(Model.id.in_(ids[kind]))
+            result = session.execute(statement)
+            rows = encoder_for(statement, result.keys()).encode_rows(result)
+        parts.append(f',"{key}":'.encode() + rows)
+
+    likes = [
+        {'kind': kind, 'id': str(id), 'likes_count': count}
+        for kind, column, change_kind in (('book', Like.book_id, Change.BOOK_LIKES), ('page', Like.page_id, Change.PAGE_LIKES))
+        for id, count in likes_counts(session, column, ids[change_kind]).items()
+    ]
+    parts.append(b',"likes":' + dumps(likes).encode() + b'}')
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=b''.join(parts))
+
+def parse_ids(value: str | None) -> list[UUID]:
+    ids = {safe_convert_to_uuid(id) for id in value.split(',')} if value else set()
+    ids.discard(UUID(int=0))
+    return list(ids)
+
+@query_budget(3)
+@auth_required
+async def get_my_likes(request: Request) -> Response:
+    book_ids = parse_ids(request.query.get('book_ids'))
+    page_ids = parse_ids(request.query.get('page_ids'))
+    user: User = request.get('user')
+
+    if max(len(book_ids), len(page_ids)) > LIKES_LOOKUP_LIMIT:
+        return Response(status=400, reason="TOO_MANY_IDS")
+
+    liked = {'book_ids': [], 'page_ids': []}
+    if book_ids or page_ids:
+        session: Session = request.app.get('session')
+
+        statement = union_all(
+            select(Like.book_id, Like.page_id).where(Like.user_id == user.id, Like.book_id.in_(book_ids)),
+            select(Like.book_id, Like.page_id).where(Like.user_id == user.id, Like.book_id == UUID(int=0), Like.page_id.in_(page_ids))
+        )
+        for book_id, page_id in session.execute(statement):
+            if book_id.int:
+                liked['book_ids'].append(str(book_id))
+            else:
+                liked['page_ids'].append(str(page_id))
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=dumps(liked))
+
+@query_budget(6)
+@auth_required
+async def follow_author(request: Request) -> Response:
+    params = await request.post()
+    author_id = safe_convert_to_uuid(params.get('author_id'))
+    user: User = request.get('user')
+
+    if author_id == user.id:
+        return Response(status=400, reason="CANNOT_FOLLOW_SELF")
+
+    session: Session = request.app.get('session')
+
+    if session.scalar(select(User.id).where(User.id == author_id)) is None:
+        return Response(status=404, reason="AUTHOR_NOT_FOUND")
+
+    if not follow(session, user.id, author_id):
+        return Response(status=409, reason="ALREADY_FOLLOWING")
+    session.commit()
+
+    return Response(status=200, reason="SUCCESS")
+
+@query_budget(5)
+@auth_required
+async def unfollow_author(request: Request) -> Response:
+    params = await request.post()
+    author_id = safe_convert_to_uuid(params.get('author_id'))
+    user: User = request.get('user')
+
+    session: Session = request.app.get('session')
+
+    unfollow(session, user.id, author_id)
+    session.commit()
+
+    return Response(status=200, reason="SUCCESS")
+
+@query_budget(5)
+@auth_required
+async def get_feed(request: Request) -> Response:
+    user: User = request.get('user')
+
+    before = request.query.get('before')
+    limit = request.query.get('limit', '')
+    limit = int(limit) if limit.isdecimal() else FEED_PAGE_SIZE
+    try:
+        before = datetime.fromisoformat(before) if before else None
+    except ValueError:
+        return Response(status=400, reason="INVALID_CURSOR")
+
+    session: Session = request.app.get('session')
+
+    items = read_feed(session, user.id, before, min(limit, 200))
+
+    ids: dict[str, list[UUID]] = {Change.BOOK: [], Change.PAGE: []}
+    for item in items:
+        ids.setdefault(item.kind, []).append(item.entity_id)
+
+    parts = [b'{"items":' + dumps([
+        {'kind': item.kind, 'id': str(item.entity_id), 'author_id': str(item.author_id), 'created_at': item.created_at.isoformat()}
+        for item in items
+    ]).encode()]
+    for key, Model, kind in (('books', Book, Change.BOOK), ('pages', Page, Change.PAGE)):
+        rows = b'[]'
+        if ids[kind]:
+            statement = Model.select(limit=None, max_limit=None).where(Model.id.in_(ids[kind]))
+            result = session.execute(statement)
+            rows = encoder_for(statement, result.keys()).encode_rows(result)
+        parts.append(f',"{key}":'.encode() + rows)
+    parts.append(b',"next_before":' + dumps(items[-1].created_at.isoformat() if items else None).encode() + b'}')
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=b''.join(parts))
+
+@query_budget(3)
+@auth_required
+async def update_bookmark(request: Request) -> Response:
+    params = await request.post()
+    page_id = safe_convert_to_uuid(params.get('page_id'))
+    user: User = request.get('user')
+
+    session: Session = request.app.get('session')
+
+    book_id = session.scalar(select(Page.book_id).where(Page.id == page_id))
+    if book_id is None:
+        return Response(status=404, reason="PAGE_NOT_FOUND")
+
+    tracker: ReadingTracker = request.app.get('reading')
+    tracker.record(user.id, book_id, page_id)
+
+    return Response(status=202, reason="ACCEPTED")
+
+@query_budget(7)
+@auth_required
+async def get_bookmarks(request: Request) -> Response:
+    user: User = request.get('user')
+    limit = request.query.get('limit', '')
+    limit = int(limit) if limit.isdecimal() else BOOKMARKS_PAGE_SIZE
+    fields = parse_fields(request)
+    if not validate_fields(Book, fields):
+        return Response(status=400, reason="INVALID_FIELDS")
+
+    session: Session = request.app.get('session')
+
+    tracker: ReadingTracker = request.app.get('reading')
+    await tracker.settle(session, user.id)
+
+    statement = (
+        Book.select_base(fields)
+        .add_columns(Bookmark.page_id.label('resume_page_id'), Bookmark.read_at)
+        .join(Bookmark, Bookmark.book_id == Book.id)
+        .where(Bookmark.user_id == user.id)
+        .order_by(Bookmark.read_at.desc())
+        .limit(min(limit, 200))
+    )
+    result = session.execute(statement)
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=encoder_for(statement, result.keys()).encode_rows(result))
+
+@query_budget(7)
+@auth_required
+async def get_history(request: Request) -> Response:
+    user: User = request.get('user')
+
+    session: Session = request.app.get('session')
+
+    tracker: ReadingTracker = request.app.get('reading')
+    await tracker.settle(session, user.id)
+
+    statement = (
+        select(HistoryEntry.book_id, Book.title.label('book_title'), HistoryEntry.page_id, HistoryEntry.read_at)
+        .join(Book, Book.id == HistoryEntry.book_id)
+        .where(HistoryEntry.user_id == user.id)
+        .order_by(HistoryEntry.read_at.desc(), HistoryEntry.id.desc())
+    )
+    result = session.execute(statement)
+
+    return Response(status=200, reason="SUCCESS", content_type='application/json', body=encoder_for(statement, result.keys()).encode_rows(result))
@@ -0,0 +1,30 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import select, delete, literal, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, InstrumentedAttribute
+
+from models import Base, Like
+
+def counterpart(column: InstrumentedAttribute) -> InstrumentedAttribute:
+    return Like.page_id if column is Like.book_id else Like.book_id
+
+def add_like(session: Session, Model: type[Base], column: InstrumentedAttribute, user_id: UUID, target_id: UUID) -> bool:
+    other = counterpart(column)
+    source = select(
+        literal(user_id, Like.user_id.type),
+        Model.id,
+        literal(UUID(int=0), other.type),
+        literal(datetime.now(), Like.created_at.type)
+    ).where(Model.id == target_id)
+
+    statement = sqlite_insert(Like).from_select([Like.user_id, column, other, Like.created_at], source).on_conflict_do_nothing()
+    return bool(session.execute(statement).rowcount)
+
+def remove_like(session: Session, column: InstrumentedAttribute, user_id: UUID, target_id: UUID) -> list[datetime | None]:
+    statement = delete(Like).where(Like.user_id == user_id, column == target_id).returning(Like.created_at)
+    return list(session.execute(statement).scalars())
+
+def count_likes(session: Session, column: InstrumentedAttribute, target_id: UUID) -> int:
+    return session.scalar(select(func.count()).select_from(Like).where(column == target_id))
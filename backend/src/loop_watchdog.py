@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import sys
+from collections import deque
+from threading import Thread, Event, get_ident
+from time import monotonic
+from traceback import format_stack
+from typing import NamedTuple
+
+from aiohttp import web
+from aiohttp.typedefs import Handler
+from aiohttp.web_request import Request
+from aiohttp.web_response import StreamResponse
+
+from config import WATCHDOG_THRESHOLD, WATCHDOG_INTERVAL
+from profiler import route_name
+
+logger = logging.getLogger(__name__)
+
+class Stall(NamedTuple):
+    route: str
+    duration: float
+    stack: str
+
+class LoopWatchdog:
+
+    def __init__(self, threshold: float = WATCHDOG_THRESHOLD, interval: float = WATCHDOG_INTERVAL, history: int = 100):
+        self.threshold = threshold
+        self.interval = interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls: deque[Stall] = deque(maxlen=history)
+        self._routes: dict[asyncio.Task, str] = {}
+        self._beat_at = monotonic()
+        self._beats = 0
+        self._stopped = Event()
+        self._heartbeat_task: asyncio.Task | None = None
+        self._thread: Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+
+    @web.middleware
+    async def middleware(self, request: Request, handler: Handler) -> StreamResponse:
+        task = asyncio.current_task()
+        self._routes[task] = route_name(request)
+        try:
+            return await handler(request)
+        finally:
+            del self._routes[task]
+
+    async def start(self, app: web.Application = None):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = get_ident()
+        self._stopped.clear()
+        self._beat_at = monotonic()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._thread = Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    async def stop(self, app: web.Application = None):
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _heartbeat(self):
+        while True:
+            expected = self._loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(self._loop.time() - expected, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            self._beat_at = monotonic()
+            self._beats += 1
+
+    def _watch(self):
+        reported = -1
+        while not self._stopped.wait(self.interval):
+            blocked_for = monotonic() - self._beat_at - self.interval
+            if blocked_for < self.threshold or self._beats == reported:
+                continue
+
+            reported = self._beats
+            frame = sys._current_frames().get(self._loop_thread_id)
+            route = self._routes.get(asyncio.current_task(self._loop), '-')
+            stall = Stall(route, blocked_for, ''.join(format_stack(frame)) if frame else '')
+            self.stalls.append(stall)
+            logger.warning("Event loop blocked for %.1f ms in %s\n%s", blocked_for * 1000, route, stall.stack)
+
+    def as_dict(self) -> dict:
+        return {
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'stalls': [stall._asdict() for stall in self.stalls]
+        }
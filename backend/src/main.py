@@ -1,22 +1,63 @@
-from config import DB_PATH, STATIC_PATH
+from config import DB_PATH, STATIC_PATH, IMAGES_FOLDER, TOKENS_CLEANUP_INTERVAL, IMAGES_GC_INTERVAL, CHANGES_COMPACTION_INTERVAL, TRENDING_DECAY_INTERVAL, FEED_TRIM_INTERVAL
 
 from aiohttp import web
 import asyncio
+import logging
 import aiohttp_cors
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
 import handlers
-from cleanups import tokens_cleanup
+from schema import upgrade_schema
+from cleanups import tokens_cleanup, images_cleanup, changes_compaction
+from trending import trending_decay
+from feed import feed_trim
+from scheduler import Scheduler
+from querystats import setup_query_stats, query_stats_middleware
+from sessions import rollback_middleware
+from profiler import RouteProfiler
+from loop_watchdog import LoopWatchdog
+from compression import ResponseCompressor
+from storage import ImageStorage
+from events import EventBus
+from variants import VariantGenerator
+from reading import ReadingTracker
+from counters import CountCache
+from genres import GenreCatalog
 
-engine = create_engine(f"sqlite:///{DB_PATH}", echo=True)
-loop = asyncio.new_event_loop()
+def create_app(session: Session) -> web.Application:
+    profiler = RouteProfiler()
+    watchdog = LoopWatchdog()
+    compressor = ResponseCompressor()
+    scheduler = Scheduler()
 
-with Session(engine) as session:
-
-    app = web.Application()
+    app = web.Application(middlewares=[compressor.middleware, query_stats_middleware, watchdog.middleware, profiler.middleware, rollback_middleware])
     app['session'] = session
+    app['profiler'] = profiler
+    app['watchdog'] = watchdog
+    app['images'] = ImageStorage()
+    app['variants'] = VariantGenerator()
+    app['scheduler'] = scheduler
+    app['events'] = EventBus()
+    app['reading'] = ReadingTracker()
+    app['counts'] = CountCache()
+    app['genres'] = GenreCatalog()
+    scheduler.add('tokens_cleanup', tokens_cleanup, TOKENS_CLEANUP_INTERVAL, session.get_bind())
+    scheduler.add('images_cleanup', images_cleanup, IMAGES_GC_INTERVAL, session.get_bind(), app['images'], app['variants'])
+    scheduler.add('changes_compaction', changes_compaction, CHANGES_COMPACTION_INTERVAL, session.get_bind())
+    scheduler.add('trending_decay', trending_decay, TRENDING_DECAY_INTERVAL, session.get_bind())
+    scheduler.add('feed_trim', feed_trim, FEED_TRIM_INTERVAL, session.get_bind())
+    app.on_startup.append(watchdog.start)
+    app.on_startup.append(app['reading'].start)
+    app.on_startup.append(app['genres'].start)
+    app.on_shutdown.append(app['events'].close)
+    app.on_cleanup.append(watchdog.stop)
+    app.on_cleanup.append(profiler.stop)
+    app.on_cleanup.append(scheduler.stop)
+    app.on_cleanup.append(app['reading'].stop)
+    app.on_cleanup.append(app['genres'].stop)
+    app.on_cleanup.append(app['variants'].close)
 
     app.add_routes([
         web.post  ('/register_user', handlers.register_user),
@@ -24,6 +65,7 @@ with Session(engine) as session:
         web.post  ('/book', handlers.create_book),
         web.post  ('/book/from_file/{file_type}', handlers.create_book_from_file),
         web.get   ('/book', handlers.get_book),
+        web.get   ('/book/{id}/events', handlers.get_book_events),
         web.get   ('/books', handlers.get_books),
         web.post  ('/book/like', handlers.like_book),
         web.delete('/book/like', handlers.unlike_book),
@@ -32,7 +74,23 @@ with Session(engine) as session:
         web.get   ('/pages', handlers.get_pages),
         web.post  ('/page/like', handlers.like_page),
         web.delete('/page/like', handlers.unlike_page),
+        web.get   ('/likes/mine', handlers.get_my_likes),
         web.get   ('/genres', handlers.get_genres),
+        web.get   ('/sync', handlers.sync),
+        web.post  ('/follow', handlers.follow_author),
+        web.delete('/follow', handlers.unfollow_author),
+        web.get   ('/feed', handlers.get_feed),
+        web.post  ('/bookmark', handlers.update_bookmark),
+        web.get   ('/bookmarks', handlers.get_bookmarks),
+        web.get   ('/history', handlers.get_history),
+        web.get   ('/admin/profile', handlers.get_profile),
+        web.post  ('/admin/profile', handlers.configure_profile),
+        web.delete('/admin/profile', handlers.reset_profile),
+        web.get   ('/admin/loop', handlers.get_loop_stats),
+        web.get   ('/admin/scheduler', handlers.get_scheduler_stats),
+        web.post  ('/admin/genres', handlers.reload_genres),
+        web.get   ('/image/{id}', handlers.get_image_variant),
+        web.get   (f'/static/{IMAGES_FOLDER}/{{name:.+}}', handlers.get_image),
         web.static('/static', STATIC_PATH, name='static')
     ])
 
@@ -48,6 +106,20 @@ with Session(engine) as session:
     for route in list(app.router.routes()):
         cors.add(route)
 
-    loop.create_task(tokens_cleanup(session))
+    return app
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    upgrade_schema(engine)
+    setup_query_stats(engine)
+    loop = asyncio.new_event_loop()
+
+    with Session(engine) as session:
+
+        app = create_app(session)
+
+        app.on_startup.append(app['scheduler'].start)
 
-    web.run_app(app, port=80, loop=loop)
\ No newline at end of file
+        web.run_app(app, port=80, loop=loop)
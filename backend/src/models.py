@@ -1,5 +1,5 @@
-from sqlalchemy import ForeignKey, func, select, Select, desc, and_, Delete, delete
-from sqlalchemy.orm import DeclarativeBase, Mapped, WriteOnlyMapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, func, select, insert, Select, desc, and_, Delete, delete, Index, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, WriteOnlyMapped, Session, mapped_column, relationship
 from sqlalchemy.types import String
 from sqlalchemy.sql.elements import ColumnElement
 
@@ -7,43 +7,74 @@ from uuid import uuid4, UUID
 from datetime import datetime
 from typing import Optional, Callable
 
+def wanted(fields: set[str] | None, name: str) -> bool:
+    return fields is None or name in fields
+
 class Base(DeclarativeBase):
 
     __order_by_options__: set[str] = set()
+    __order_by_aliases__: dict[str, str] = {}
     __filter_options__: dict[str, Callable[[str], ColumnElement[bool]]] = {}
+    __counters__: set[str] | None = None
+    __extra_fields__: set[str] = set()
     
     @classmethod
-    def select(cls, order_by: str | None = None, where: dict[str, str] = {}, desc_: bool = False, offset: int = 0, limit: int = 20) -> Select:
+    def select(cls, order_by: str | None = None, where: dict[str, str] = {}, desc_: bool = False, offset: int = 0, limit: int | None = 20, max_limit: int | None = 200, fields: set[str] | None = None) -> Select:
         _where = []
         for op, ex in cls.__filter_options__.items():
             if op in where:
                 _where.append(ex(where[op]))
 
-        _order_by = order_by
+        _order_by = cls.order_key(order_by)
+
+        _fields = fields
+        if _fields is not None and _order_by:
+            _fields = _fields | {_order_by}
 
-        if _order_by not in cls.__order_by_options__:
-            _order_by = None
+        if _order_by and _order_by in cls.__table__.columns:
+            _order_by = cls.__table__.columns[_order_by]
         
-        if desc_ and _order_by:
+        if desc_ and _order_by is not None:
             _order_by = desc(_order_by)
 
         _offset = offset
 
-        _limit = limit
-        if _limit > 200:
-            _limit = 20
+        _limit = cls.page_limit(limit, max_limit)
 
         return (
-            cls.select_base()
+            cls.select_base(_fields)
             .where(True, *_where)
             .order_by(_order_by)
             .offset(_offset)
             .limit(_limit)
         )
 
+    @staticmethod
+    def page_limit(limit: int | None, max_limit: int | None) -> int | None:
+        if max_limit is not None and (limit is None or limit > max_limit):
+            return 20
+        return limit
+
+    @classmethod
+    def order_key(cls, order_by: str | None) -> str | None:
+        if order_by not in cls.__order_by_options__:
+            return None
+        return cls.__order_by_aliases__.get(order_by, order_by)
+
+    @classmethod
+    def field_names(cls) -> set[str]:
+        return set(cls.__table__.columns.keys()) | cls.__extra_fields__
+
     @classmethod
-    def select_base(cls) -> Select:
-        return select(*cls.__table__.columns)
+    def select_base(cls, fields: set[str] | None = None) -> Select:
+        return select(*cls.columns(fields)).select_from(cls)
+
+    @classmethod
+    def columns(cls, fields: set[str] | None = None) -> list[ColumnElement]:
+        return [
+            column for column in cls.__table__.columns
+            if wanted(fields, column.key) or column.primary_key
+        ]
 
     @classmethod
     def delete(cls, where: dict[str, str] = {}) -> Delete:
@@ -67,15 +98,17 @@ class User(Base):
     pages: Mapped[list["Page"]] = relationship(back_populates="author")
     tokens: WriteOnlyMapped[list["Token"]] = relationship(back_populates="user")
     likes: Mapped[list["Like"]] = relationship(back_populates='user')
+    followers_count: Mapped[int] = mapped_column(insert_default=0)
 
 class Token(Base):
     __tablename__ = 'tokens'
+    __table_args__ = (Index('ix_tokens_inactive', 'created_at', sqlite_where=text('active = 0')),)
 
     id: Mapped[UUID] = mapped_column(primary_key=True, insert_default=uuid4)
     active: Mapped[bool] = mapped_column(insert_default=True)
     user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="tokens")
-    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
+    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now, index=True)
 
     def __str__(self):
         return str(self.id)
@@ -92,12 +125,21 @@ class Book(Base):
         "created_before": lambda created_before: Book.created_at < datetime.fromisoformat(created_before)
     }
 
+    __counters__ = {'author_id'}
+
     __order_by_options__ = {
         'created_at',
         'title',
-        'likes_count'
+        'likes_count',
+        'trending'
     }
 
+    __order_by_aliases__ = {
+        'trending': 'trending_score'
+    }
+
+    __extra_fields__ = {'likes_count', 'author', 'first_page_id', 'genre', 'image_path'}
+
 
     id: Mapped[UUID] = mapped_column(primary_key=True, insert_default=uuid4)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -108,28 +150,34 @@ class Book(Base):
     created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
     pages: WriteOnlyMapped[list["Page"]] = relationship(back_populates="book")
     likes: WriteOnlyMapped[list["Like"]] = relationship(back_populates='book')
-    cover_image_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("images.id"))
+    cover_image_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("images.id"), index=True)
+    trending_score: Mapped[float] = mapped_column(insert_default=0.0, index=True)
 
     @classmethod
-    def select_base(cls) -> Select:
-        return (
-            select(
-                *cls.__table__.columns, 
-                func.count(Like.user_id).label("likes_count"),
-                User.id.label("author_id"),  
-                User.username.label("author"), 
-                Page.id.label("first_page_id"),
-                Genre.id.label("genre_id"),
-                Genre.name.label("genre"),
-                Image.path.label("image_path")
-            )
-            .join_from(cls, Like, cls.id == Like.book_id, isouter=True)
-            .join(User, cls.author_id == User.id)
-            .join(Page, and_(cls.id == Page.book_id, Page.first == True), isouter=True)
-            .join(Genre, cls.genre_id == Genre.id, isouter=True)
-            .join(Image, cls.cover_image_id == Image.id, isouter=True)
-            .group_by(cls.id)
-        )
+    def select_base(cls, fields: set[str] | None = None) -> Select:
+        columns = cls.columns(fields)
+        joins = []
+
+        if wanted(fields, 'likes_count'):
+            columns.append(Like.count(Like.book_id == cls.id).label("likes_count"))
+        if wanted(fields, 'author'):
+            columns.append(User.username.label("author"))
+            joins.append((User, cls.author_id == User.id, False))
+        if wanted(fields, 'first_page_id'):
+            columns.append(Page.id.label("first_page_id"))
+            joins.append((Page, and_(cls.id == Page.book_id, Page.first == True), True))
+        if wanted(fields, 'genre'):
+            columns.append(Genre.name.label("genre"))
+            joins.append((Genre, cls.genre_id == Genre.id, True))
+        if wanted(fields, 'image_path'):
+            columns.append(Image.path.label("image_path"))
+            joins.append((Image, cls.cover_image_id == Image.id, True))
+
+        statement = select(*columns).select_from(cls)
+        for target, onclause, isouter in joins:
+            statement = statement.join(target, onclause, isouter=isouter)
+
+        return statement
         
 
 
@@ -138,19 +186,29 @@ class Page(Base):
 
     __filter_options__ = {
         'id': lambda id: Page.id == UUID(hex=id),
-        'next_for': lambda prev_page_id: Page.previous_page_id == UUID(hex=prev_page_id)
+        'next_for': lambda prev_page_id: Page.previous_page_id == UUID(hex=prev_page_id),
+        'book_id': lambda book_id: Page.book_id == UUID(hex=book_id)
     }
 
+    __counters__ = {'book_id'}
+
     __order_by_options__ = {
         'created_at',
-        'likes_count'
+        'likes_count',
+        'trending'
     }
 
+    __order_by_aliases__ = {
+        'trending': 'trending_score'
+    }
+
+    __extra_fields__ = {'likes_count', 'author', 'book_title'}
+
     MAX_LENGTH = 2500
 
     id: Mapped[UUID] = mapped_column(primary_key=True, insert_default=uuid4)
     text: Mapped[str] = mapped_column(String(10000))
-    book_id: Mapped[UUID] = mapped_column(ForeignKey("books.id"))
+    book_id: Mapped[UUID] = mapped_column(ForeignKey("books.id"), index=True)
     book: Mapped["Book"] = relationship(back_populates="pages")
     first: Mapped[bool] = mapped_column(nullable=False, default=False)
     last: Mapped[bool] = mapped_column(nullable=False, default=False)
@@ -161,26 +219,31 @@ class Page(Base):
     author: Mapped["User"] = relationship(back_populates="pages")
     created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
     likes: WriteOnlyMapped[list["Like"]] = relationship(back_populates='page')
+    trending_score: Mapped[float] = mapped_column(insert_default=0.0, index=True)
 
     @classmethod
-    def select_base(cls) -> Select:
-        return (
-            select(
-                *cls.__table__.columns, 
-                func.count(Like.user_id).label("likes_count"), 
-                User.id.label("author_id"),  
-                User.username.label("author"),
-                Book.id.label("book_id"),
-                Book.title.label("book_title")
-            )
-            .join_from(cls, Like, cls.id == Like.page_id, isouter=True)
-            .join(User, cls.author_id == User.id)
-            .join(Book, cls.book_id == Book.id)
-            .group_by(cls.id)
-        )
+    def select_base(cls, fields: set[str] | None = None) -> Select:
+        columns = cls.columns(fields)
+        joins = []
+
+        if wanted(fields, 'likes_count'):
+            columns.append(Like.count(Like.page_id == cls.id).label("likes_count"))
+        if wanted(fields, 'author'):
+            columns.append(User.username.label("author"))
+            joins.append((User, cls.author_id == User.id, False))
+        if wanted(fields, 'book_title'):
+            columns.append(Book.title.label("book_title"))
+            joins.append((Book, cls.book_id == Book.id, False))
+
+        statement = select(*columns).select_from(cls)
+        for target, onclause, isouter in joins:
+            statement = statement.join(target, onclause, isouter=isouter)
+
+        return statement
 
 class Like(Base):
     __tablename__ = 'likes'
+    __table_args__ = (Index('ix_likes_book_id', 'book_id'), Index('ix_likes_page_id', 'page_id'))
 
     __filter_options__ = {
         "user_id": lambda user_id: Like.user_id == UUID(hex=user_id),
@@ -194,6 +257,15 @@ class Like(Base):
     book: Mapped["Book"] = relationship(back_populates="likes")
     page_id: Mapped[UUID] = mapped_column(ForeignKey("pages.id"), insert_default=UUID(int=0), primary_key=True)
     page: Mapped["Page"] = relationship(back_populates="likes")
+    created_at: Mapped[Optional[datetime]] = mapped_column(insert_default=datetime.now)
+
+    @classmethod
+    def count(cls, where: ColumnElement[bool]) -> ColumnElement[int]:
+        return select(func.count()).select_from(cls).where(where).scalar_subquery()
+
+    @classmethod
+    def liked_by(cls, user_id: UUID, where: ColumnElement[bool]) -> ColumnElement[bool]:
+        return select(cls.user_id).where(cls.user_id == user_id, where).exists()
     
 
 class Genre(Base):
@@ -207,4 +279,77 @@ class Image(Base):
     __tablename__ = 'images'
 
     id: Mapped[UUID] = mapped_column(primary_key=True, insert_default=uuid4)
-    path: Mapped[str] = mapped_column(String(200))
\ No newline at end of file
+    path: Mapped[str] = mapped_column(String(200))
+    digest: Mapped[Optional[str]] = mapped_column(String(64), unique=True)
+    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
+class Change(Base):
+    __tablename__ = 'changes'
+    __table_args__ = (Index('ix_changes_entity', 'kind', 'entity_id', 'id'),)
+
+    BOOK = 'book'
+    PAGE = 'page'
+    BOOK_LIKES = 'book_likes'
+    PAGE_LIKES = 'page_likes'
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(16))
+    entity_id: Mapped[UUID]
+    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
+
+    @classmethod
+    def record(cls, session: Session, *changes: tuple[str, UUID]):
+        session.execute(insert(cls), [{'kind': kind, 'entity_id': entity_id} for kind, entity_id in changes])
+
+class Follow(Base):
+    __tablename__ = 'follows'
+    __table_args__ = (Index('ix_follows_author_id', 'author_id'),)
+
+    follower_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    author_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
+
+class Post(Base):
+    __tablename__ = 'posts'
+    __table_args__ = (Index('ix_posts_author_id', 'author_id', 'created_at'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    author_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    kind: Mapped[str] = mapped_column(String(16))
+    entity_id: Mapped[UUID]
+    created_at: Mapped[datetime] = mapped_column(insert_default=datetime.now)
+
+class FeedItem(Base):
+    __tablename__ = 'feed_items'
+    __table_args__ = (Index('ix_feed_items_user_id', 'user_id', 'created_at'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    author_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    kind: Mapped[str] = mapped_column(String(16))
+    entity_id: Mapped[UUID]
+    created_at: Mapped[datetime]
+
+class Bookmark(Base):
+    __tablename__ = 'bookmarks'
+    __table_args__ = (Index('ix_bookmarks_user_id', 'user_id', 'read_at'),)
+
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    book_id: Mapped[UUID] = mapped_column(ForeignKey("books.id"), primary_key=True)
+    page_id: Mapped[UUID] = mapped_column(ForeignKey("pages.id"))
+    read_at: Mapped[datetime]
+
+class HistoryEntry(Base):
+    __tablename__ = 'reading_history'
+    __table_args__ = (Index('ix_reading_history_user_id', 'user_id', 'read_at'),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id"))
+    book_id: Mapped[UUID] = mapped_column(ForeignKey("books.id"))
+    page_id: Mapped[UUID] = mapped_column(ForeignKey("pages.id"))
+    read_at: Mapped[datetime]
+
+class Counter(Base):
+    __tablename__ = 'counters'
+
+    key: Mapped[str] = mapped_column(String(80), primary_key=True)
+    value: Mapped[int] = mapped_column(default=0)
@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from collections import Counter
+from os import path
+from threading import Thread, Event, get_ident
+from types import FrameType
+
+from aiohttp import web
+from aiohttp.typedefs import Handler
+from aiohttp.web_request import Request
+from aiohttp.web_response import StreamResponse
+
+from config import ADMIN_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL, PROFILE_HEADER
+
+MAX_STACKS_PER_ROUTE = 10000
+
+def route_name(request: Request) -> str:
+    resource = request.match_info.route.resource
+    return f"{request.method} {resource.canonical if resource else request.path}"
+
+def collapse(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class RouteProfiler:
+
+    def __init__(self, sample_rate: int = PROFILE_SAMPLE_RATE, interval: float = PROFILE_INTERVAL):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.stacks: dict[str, Counter[str]] = {}
+        self._requests = 0
+        self._active: dict[asyncio.Task, str] = {}
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+
+    def should_sample(self, request: Request) -> bool:
+        if ADMIN_TOKEN and request.headers.get(PROFILE_HEADER) == ADMIN_TOKEN:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        self._requests += 1
+        return self._requests % self.sample_rate == 0
+
+    @web.middleware
+    async def middleware(self, request: Request, handler: Handler) -> StreamResponse:
+        if not self.should_sample(request):
+            return await handler(request)
+
+        task = asyncio.current_task()
+        self._ensure_started()
+        self._active[task] = route_name(request)
+        self._wakeup.set()
+        try:
+            return await handler(request)
+        finally:
+            del self._active[task]
+            if not self._active:
+                self._wakeup.clear()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = get_ident()
+        self._thread = Thread(target=self._sample_forever, name='route-profiler', daemon=True)
+        self._thread.start()
+
+    def _sample_forever(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            if self._stopped.wait(self.interval):
+                break
+
+            task = asyncio.current_task(self._loop)
+            route = self._active.get(task)
+            if route is None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stacks = self.stacks.setdefault(route, Counter())
+            stack = collapse(frame)
+            if stack in stacks or len(stacks) < MAX_STACKS_PER_ROUTE:
+                stacks[stack] += 1
+
+    def collapsed(self, route: str | None = None) -> str:
+        lines = []
+        for name, stacks in list(self.stacks.items()):
+            if route is not None and name != route:
+                continue
+            for stack, count in sorted(dict(stacks).items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"{stack} {count}" if route else f"{name};{stack} {count}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        self.stacks = {}
+
+    async def stop(self, app: web.Application = None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,115 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from aiohttp import web
+from aiohttp.typedefs import Handler
+from aiohttp.web_request import Request
+from aiohttp.web_response import StreamResponse
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, Connection
+
+from config import SLOW_QUERY_THRESHOLD, QUERY_BUDGET_STRICT
+
+logger = logging.getLogger(__name__)
+
+STRICT = QUERY_BUDGET_STRICT
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+class QueryStats:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+current_stats: ContextVar[QueryStats | None] = ContextVar('current_stats', default=None)
+
+def setup_query_stats(engine: Engine, slow_query_threshold: float = SLOW_QUERY_THRESHOLD):
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn: Connection, cursor, statement, parameters, context, executemany):
+        conn.info['query_started_at'] = perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn: Connection, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info.pop('query_started_at')
+
+        stats = current_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+
+        if elapsed >= slow_query_threshold:
+            logger.warning(
+                "Slow query (%.1f ms): %s\nParameters: %r\nPlan:\n%s",
+                elapsed * 1000, statement, parameters, explain(conn, statement, parameters, executemany)
+            )
+
+def explain(conn: Connection, statement: str, parameters, executemany: bool = False) -> str:
+    if executemany or not statement.lstrip().upper().startswith('SELECT'):
+        return '-'
+
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' '.join(str(value) for value in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'unavailable ({e})'
+    finally:
+        cursor.close()
+
+@web.middleware
+async def query_stats_middleware(request: Request, handler: Handler) -> StreamResponse:
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    try:
+        response = await handler(request)
+    finally:
+        current_stats.reset(token)
+
+    if not response.prepared:
+        response.headers['Server-Timing'] = stats.server_timing()
+
+    return response
+
+@contextmanager
+def count_queries(merge: bool = True):
+    outer = current_stats.get()
+    stats = QueryStats()
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+        if outer is not None and merge:
+            outer.count += stats.count
+            outer.duration += stats.duration
+
+def query_budget(limit: int, strict: bool | None = None):
+    def decorator(handler: Handler):
+        @wraps(handler)
+        async def wrapper(request: Request):
+            with count_queries() as stats:
+                response = await handler(request)
+
+            if stats.count > limit:
+                message = f"{handler.__name__} ran {stats.count} queries, budget is {limit}"
+                if (STRICT if strict is None else strict):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+            return response
+
+        return wrapper
+
+    return decorator
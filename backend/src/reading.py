@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from functools import partial
+from uuid import UUID
+
+from aiohttp import web
+from sqlalchemy import select, insert, delete, func, Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import READING_FLUSH_INTERVAL, READING_FLUSH_SIZE, READING_HISTORY_SIZE
+from models import Bookmark, HistoryEntry
+
+logger = logging.getLogger(__name__)
+
+Bookmarks = dict[tuple[UUID, UUID], tuple[UUID, datetime]]
+History = dict[UUID, list[tuple[UUID, UUID, datetime]]]
+
+def write_progress(session: Session, bookmarks: Bookmarks, history: History, history_size: int = READING_HISTORY_SIZE):
+    if bookmarks:
+        statement = sqlite_insert(Bookmark)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Bookmark.user_id, Bookmark.book_id],
+            set_={'page_id': statement.excluded.page_id, 'read_at': statement.excluded.read_at},
+            where=statement.excluded.read_at > Bookmark.read_at
+        )
+        session.execute(statement, [
+            {'user_id': user_id, 'book_id': book_id, 'page_id': page_id, 'read_at': read_at}
+            for (user_id, book_id), (page_id, read_at) in bookmarks.items()
+        ])
+
+    if history:
+        session.execute(insert(HistoryEntry), [
+            {'user_id': user_id, 'book_id': book_id, 'page_id': page_id, 'read_at': read_at}
+            for user_id, entries in history.items()
+            for book_id, page_id, read_at in entries
+        ])
+
+        ranked = select(
+            HistoryEntry.id,
+            func.row_number().over(partition_by=HistoryEntry.user_id, order_by=HistoryEntry.read_at.desc()).label('position')
+        ).where(HistoryEntry.user_id.in_(list(history))).subquery()
+        overflow = select(ranked.c.id).where(ranked.c.position > history_size)
+        session.execute(delete(HistoryEntry).where(HistoryEntry.id.in_(overflow.scalar_subquery())))
+
+def flush_progress(engine: Engine, bookmarks: Bookmarks, history: History):
+    with Session(engine) as session:
+        write_progress(session, bookmarks, history)
+        session.commit()
+
+class ReadingTracker:
+
+    def __init__(self, interval: float = READING_FLUSH_INTERVAL, flush_size: int = READING_FLUSH_SIZE):
+        self.interval = interval
+        self.flush_size = flush_size
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self._bookmarks: Bookmarks = {}
+        self._history: History = defaultdict(list)
+        self._engine: Engine | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._flushing: asyncio.Future | None = None
+        self._lock = asyncio.Lock()
+
+    def record(self, user_id: UUID, book_id: UUID, page_id: UUID):
+        read_at = datetime.now()
+        self._bookmarks[(user_id, book_id)] = (page_id, read_at)
+
+        entries = self._history[user_id]
+        if not entries or entries[-1][1] != page_id:
+            entries.append((book_id, page_id, read_at))
+
+        self.recorded += 1
+        if len(self._bookmarks) >= self.flush_size:
+            self._wakeup.set()
+
+    def pending(self, user_id: UUID) -> bool:
+        return user_id in self._history
+
+    async def start(self, app: web.Application):
+        self._engine = app['session'].get_bind()
+        self._task = asyncio.create_task(self._loop(), name='reading-tracker')
+
+    async def stop(self, app: web.Application = None):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if self._flushing is not None:
+                await asyncio.gather(asyncio.shield(self._flushing), return_exceptions=True)
+            if not self._bookmarks or self._engine is None:
+                return
+
+            bookmarks, history = self._bookmarks, dict(self._history)
+            self._bookmarks, self._history = {}, defaultdict(list)
+
+            future = asyncio.get_running_loop().run_in_executor(None, flush_progress, self._engine, bookmarks, history)
+            future.add_done_callback(partial(self._flushed, bookmarks=bookmarks, history=history))
+            self._flushing = future
+            await asyncio.gather(asyncio.shield(future), return_exceptions=True)
+
+    def _flushed(self, future: asyncio.Future, bookmarks: Bookmarks, history: History):
+        if self._flushing is future:
+            self._flushing = None
+
+        if future.cancelled() or future.exception() is not None:
+            logger.error('Failed to flush %d bookmarks', len(bookmarks), exc_info=None if future.cancelled() else future.exception())
+            self._restore(bookmarks, history)
+        else:
+            self.flushes += 1
+            self.written += len(bookmarks)
+
+    def _restore(self, bookmarks: Bookmarks, history: History):
+        for key, value in bookmarks.items():
+            self._bookmarks.setdefault(key, value)
+        for user_id, entries in history.items():
+            self._history[user_id][:0] = entries
+
+    async def settle(self, session: Session, user_id: UUID):
+        if self._flushing is not None:
+            await asyncio.gather(asyncio.shield(self._flushing), return_exceptions=True)
+        if not self.pending(user_id):
+            return
+
+        bookmarks = {key: self._bookmarks.pop(key) for key in [key for key in self._bookmarks if key[0] == user_id]}
+        history = {user_id: self._history.pop(user_id)}
+        write_progress(session, bookmarks, history)
+        session.commit()
+        self.written += len(bookmarks)
+
+    def as_dict(self) -> dict:
+        return {
+            'pending': len(self._bookmarks),
+            'recorded': self.recorded,
+            'written': self.written,
+            'flushes': self.flushes
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from random import uniform
+from time import monotonic, time
+from typing import Callable
+
+from aiohttp import web
+
+from config import SCHEDULER_JITTER, SCHEDULER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+class Job:
+
+    def __init__(self, name: str, func: Callable, interval: float, args: tuple, jitter: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.args = args
+        self.jitter = jitter
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started_at: float | None = None
+        self.last_success_at: float | None = None
+        self.last_duration: float | None = None
+        self.last_error: str | None = None
+        self.next_run_at: float | None = None
+
+    def delay(self) -> float:
+        return max(self.interval * (1 + uniform(-self.jitter, self.jitter)), 0.0)
+
+    def as_dict(self) -> dict:
+        progress = getattr(self.func, 'as_dict', None)
+        return {
+            'interval': self.interval,
+            'running': self.running,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_started_at': self.last_started_at,
+            'last_success_at': self.last_success_at,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+            'next_run_at': self.next_run_at,
+            'progress': progress() if progress else None
+        }
+
+class Scheduler:
+
+    def __init__(self, workers: int = SCHEDULER_WORKERS, jitter: float = SCHEDULER_JITTER):
+        self.workers = workers
+        self.jitter = jitter
+        self.jobs: dict[str, Job] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    def add(self, name: str, func: Callable, interval: float, *args, jitter: float | None = None):
+        self.jobs[name] = Job(name, func, interval, args, self.jitter if jitter is None else jitter)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, app: web.Application = None):
+        if self.started:
+            return
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='scheduler')
+        self._tasks = [asyncio.create_task(self._loop(job), name=f'scheduler:{job.name}') for job in self.jobs.values()]
+
+    async def stop(self, app: web.Application = None):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _loop(self, job: Job):
+        delay = uniform(0, job.interval * job.jitter)
+        while True:
+            job.next_run_at = time() + delay
+            await asyncio.sleep(delay)
+            await self.run(job)
+            delay = job.delay()
+
+    async def run(self, job: Job) -> bool:
+        if job.running:
+            return False
+
+        job.running = True
+        job.last_started_at = time()
+        started = monotonic()
+        try:
+            if asyncio.iscoroutinefunction(job.func):
+                await job.func(*job.args)
+            else:
+                await asyncio.get_running_loop().run_in_executor(self._executor, job.func, *job.args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            job.failures += 1
+            job.last_error = repr(error)
+            logger.exception('Scheduled job %s failed', job.name)
+        else:
+            job.last_success_at = time()
+            job.last_error = None
+        finally:
+            job.runs += 1
+            job.last_duration = monotonic() - started
+            job.running = False
+        return True
+
+    def as_dict(self) -> dict:
+        return {'started': self.started, 'jobs': {name: job.as_dict() for name, job in self.jobs.items()}}
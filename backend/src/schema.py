@@ -0,0 +1,66 @@
+import logging
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Engine, Executable, inspect, select, update, func, text
+from sqlalchemy.engine import Connection
+
+from models import Base, User, Image, Follow
+
+logger = logging.getLogger(__name__)
+
+class AddColumn:
+
+    def __init__(self, table: str, column: str, definition: str, *after: Callable[[], Executable]):
+        self.table = table
+        self.column = column
+        self.definition = definition
+        self.after = after
+
+    def apply(self, connection: Connection, existing: set[str]) -> bool:
+        if self.column in existing:
+            return False
+        connection.execute(text(f'ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}'))
+        for statement in self.after:
+            connection.execute(statement())
+        return True
+
+class DropColumn:
+
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+
+    def apply(self, connection: Connection, existing: set[str]) -> bool:
+        if self.column not in existing:
+            return False
+        connection.execute(text(f'ALTER TABLE {self.table} DROP COLUMN {self.column}'))
+        return True
+
+CHANGES = (
+    AddColumn(
+        'users', 'followers_count', 'INTEGER NOT NULL DEFAULT 0',
+        lambda: update(User).values(followers_count=select(func.count()).where(Follow.author_id == User.id).scalar_subquery())
+    ),
+    AddColumn('books', 'trending_score', 'FLOAT NOT NULL DEFAULT 0'),
+    AddColumn('pages', 'trending_score', 'FLOAT NOT NULL DEFAULT 0'),
+    AddColumn('likes', 'created_at', 'DATETIME'),
+    AddColumn('images', 'digest', 'VARCHAR(64)', lambda: text('CREATE UNIQUE INDEX ix_images_digest ON images (digest)')),
+    AddColumn('images', 'created_at', 'DATETIME', lambda: update(Image).values(created_at=datetime.now())),
+    DropColumn('images', 'reference_count'),
+)
+
+def upgrade_schema(engine: Engine):
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        columns = {table: {column['name'] for column in inspector.get_columns(table)} for table in {change.table for change in CHANGES}}
+
+        for change in CHANGES:
+            if change.apply(connection, columns[change.table]):
+                logger.info('Schema upgrade: %s %s.%s', type(change).__name__, change.table, change.column)
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
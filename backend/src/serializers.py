@@ -0,0 +1,94 @@
+from datetime import date, datetime
+from json import dumps
+from json.encoder import encode_basestring_ascii
+from typing import Callable, Iterable, Sequence
+from uuid import UUID
+
+from sqlalchemy import Select
+from sqlalchemy.types import TypeEngine
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Encoder = Callable[[object], str]
+
+def encode_uuid(value: UUID) -> str:
+    return f'"{value}"'
+
+def encode_datetime(value: datetime | date) -> str:
+    return f'"{value.isoformat()}"'
+
+def encode_bool(value: bool) -> str:
+    return 'true' if value else 'false'
+
+def encode_any(value: object) -> str:
+    return dumps(value, default=str)
+
+ENCODERS: dict[type, Encoder] = {
+    UUID: encode_uuid,
+    datetime: encode_datetime,
+    date: encode_datetime,
+    str: encode_basestring_ascii,
+    bool: encode_bool,
+    int: int.__repr__,
+    float: float.__repr__,
+}
+
+def column_encoder(type_: TypeEngine) -> Encoder:
+    try:
+        return ENCODERS.get(type_.python_type, encode_any)
+    except NotImplementedError:
+        return encode_any
+
+def default(value: object) -> str:
+    return str(value)
+
+class RowEncoder:
+
+    def __init__(self, columns: Sequence[tuple[str, TypeEngine]], accelerated: bool = orjson is not None):
+        self.accelerated = accelerated
+        self._indexes: list[int] = []
+        self._keys: list[str] = []
+        self._fields: list[tuple[int, str, Encoder]] = []
+
+        for index, (key, type_) in enumerate(columns):
+            prefix = ('{' if not self._fields else ',') + encode_basestring_ascii(key) + ':'
+            self._indexes.append(index)
+            self._keys.append(key)
+            self._fields.append((index, prefix, column_encoder(type_)))
+
+    def _row(self, row: Sequence) -> str:
+        if not self._fields:
+            return '{}'
+        parts = []
+        for index, prefix, encode in self._fields:
+            value = row[index]
+            parts.append(prefix + ('null' if value is None else encode(value)))
+        parts.append('}')
+        return ''.join(parts)
+
+    def _dict(self, row: Sequence) -> dict:
+        return {key: row[index] for key, index in zip(self._keys, self._indexes)}
+
+    def encode_row(self, row: Sequence) -> bytes:
+        if self.accelerated:
+            return orjson.dumps(self._dict(row), default=default)
+        return self._row(row).encode()
+
+    def encode_rows(self, rows: Iterable[Sequence]) -> bytes:
+        if self.accelerated:
+            return orjson.dumps([self._dict(row) for row in rows], default=default)
+        return ('[' + ','.join(self._row(row) for row in rows) + ']').encode()
+
+_encoders: dict[tuple, RowEncoder] = {}
+
+def encoder_for(statement: Select, keys: Sequence[str]) -> RowEncoder:
+    types = tuple(column.type for column in statement.selected_columns)
+    key = tuple(zip(keys, map(type, types)))
+
+    encoder = _encoders.get(key)
+    if encoder is None:
+        encoder = _encoders[key] = RowEncoder(tuple(zip(keys, types)))
+    return encoder
@@ -0,0 +1,15 @@
+from aiohttp import web
+from aiohttp.typedefs import Handler
+from aiohttp.web_request import Request
+from aiohttp.web_response import StreamResponse
+
+from sqlalchemy.orm import Session
+
+@web.middleware
+async def rollback_middleware(request: Request, handler: Handler) -> StreamResponse:
+    try:
+        return await handler(request)
+    except BaseException:
+        session: Session = request.app.get('session')
+        session.rollback()
+        raise
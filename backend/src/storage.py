@@ -0,0 +1,203 @@
+import asyncio
+from datetime import datetime, timedelta
+from hashlib import sha256
+from os import makedirs, path, remove, replace, listdir, stat
+from tempfile import NamedTemporaryFile
+from time import time
+
+from sqlalchemy import select, delete, exists
+from sqlalchemy.orm import Session
+from aiohttp import BodyPartReader
+
+from config import STATIC_PATH, IMAGES_FOLDER, IMAGES_GC_GRACE, IMAGE_MAX_SIZE, UPLOAD_FLUSH_SIZE
+from models import Image, Book
+
+TEMP_FOLDER = 'tmp'
+SIGNATURE_SIZE = 12
+
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+
+class UploadError(Exception):
+    pass
+
+class ImageTooBig(UploadError):
+    pass
+
+class InvalidImage(UploadError):
+    pass
+
+def clean_extension(extension: str | None) -> str:
+    extension = ''.join(ch for ch in (extension or '') if ch.isalnum()).lower()[:10]
+    return extension or 'bin'
+
+def sniff_image(header: bytes) -> str | None:
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+class ImageWriter:
+
+    def __init__(self, temp_path: str):
+        self._file = NamedTemporaryFile(dir=temp_path, delete=False)
+        self._hash = sha256()
+        self.temp_name = self._file.name
+        self.size = 0
+        self.stored = False
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def discard(self):
+        self.close()
+        if self.stored:
+            return
+        try:
+            remove(self.temp_name)
+        except FileNotFoundError:
+            pass
+
+class UploadSpool:
+
+    def __init__(self, writer: ImageWriter, max_size: int = IMAGE_MAX_SIZE, flush_size: int = UPLOAD_FLUSH_SIZE):
+        self.writer = writer
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.size = 0
+        self.extension: str | None = None
+        self._header = b''
+        self._buffer = bytearray()
+
+    async def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise ImageTooBig()
+
+        if len(self._header) < SIGNATURE_SIZE:
+            self._header += chunk[:SIGNATURE_SIZE - len(self._header)]
+
+        self._buffer += chunk
+        if len(self._buffer) >= self.flush_size:
+            await self._flush()
+
+    async def write_field(self, field: BodyPartReader):
+        while chunk := await field.read_chunk():
+            await self.write(chunk)
+
+    async def _flush(self):
+        data, self._buffer = bytes(self._buffer), bytearray()
+        if data:
+            await asyncio.get_running_loop().run_in_executor(None, self.writer.write, data)
+
+    async def finish(self) -> str:
+        if self.extension is None:
+            await self._flush()
+            await asyncio.get_running_loop().run_in_executor(None, self.writer.close)
+
+            self.extension = sniff_image(self._header)
+            if self.extension is None:
+                raise InvalidImage()
+        return self.extension
+
+    def discard(self):
+        self.writer.discard()
+
+class ImageStorage:
+
+    def __init__(self, root: str = STATIC_PATH, folder: str = IMAGES_FOLDER):
+        self.root = root
+        self.folder = folder
+        self.temp_path = path.join(root, folder, TEMP_FOLDER)
+        makedirs(self.temp_path, exist_ok=True)
+
+    def relative_path(self, digest: str, extension: str) -> str:
+        return '/'.join((self.folder, digest[:2], digest[2:4], f'{digest}.{extension}'))
+
+    def full_path(self, relative_path: str) -> str:
+        return path.join(self.root, *relative_path.split('/'))
+
+    def open(self) -> ImageWriter:
+        return ImageWriter(self.temp_path)
+
+    def store(self, writer: ImageWriter, extension: str) -> str:
+        writer.close()
+        relative_path = self.relative_path(writer.digest, clean_extension(extension))
+        full_path = self.full_path(relative_path)
+
+        if path.exists(full_path):
+            writer.discard()
+        else:
+            makedirs(path.dirname(full_path), exist_ok=True)
+            replace(writer.temp_name, full_path)
+            writer.stored = True
+
+        return relative_path
+
+    def save(self, session: Session, writer: ImageWriter, extension: str) -> Image:
+        writer.close()
+        image = session.execute(select(Image).where(Image.digest == writer.digest)).scalar_one_or_none()
+
+        if image is not None:
+            writer.discard()
+            return image
+
+        image = Image(path=self.store(writer, extension), digest=writer.digest)
+        session.add(image)
+        return image
+
+    def spool(self, max_size: int = IMAGE_MAX_SIZE) -> UploadSpool:
+        return UploadSpool(self.open(), max_size)
+
+    async def save_spool(self, session: Session, spool: UploadSpool) -> Image:
+        extension = await spool.finish()
+        return self.save(session, spool.writer, extension)
+
+    async def save_bytes(self, session: Session, data: bytes) -> Image:
+        spool = self.spool()
+        try:
+            await spool.write(data)
+            return await self.save_spool(session, spool)
+        finally:
+            spool.discard()
+
+    def collect_garbage(self, session: Session) -> list:
+        cutoff = datetime.now() - timedelta(seconds=IMAGES_GC_GRACE)
+        images = session.execute(
+            delete(Image).where(
+                Image.digest.is_not(None),
+                Image.created_at < cutoff,
+                ~exists().where(Book.cover_image_id == Image.id)
+            ).returning(Image.id, Image.path, Image.digest)
+        ).all()
+        session.commit()
+
+        for image in images:
+            try:
+                remove(self.full_path(image.path))
+            except FileNotFoundError:
+                pass
+
+        for name in listdir(self.temp_path):
+            temp_name = path.join(self.temp_path, name)
+            if stat(temp_name).st_mtime < time() - IMAGES_GC_GRACE:
+                remove(temp_name)
+
+        return images
@@ -0,0 +1,211 @@
+from config import DB_PATH, HOST, PORT, WORKERS, WORKERS_REUSE_PORT, WORKER_MIN_UPTIME, SHUTDOWN_TIMEOUT, LEADER_LOCK_PATH, LEADER_RETRY_INTERVAL
+
+import asyncio
+import fcntl
+import logging
+import os
+import signal
+import socket
+import time
+
+from aiohttp import web
+from sqlalchemy import create_engine, event, Engine
+from sqlalchemy.orm import Session
+
+from main import create_app
+from schema import upgrade_schema
+from querystats import setup_query_stats
+
+logger = logging.getLogger(__name__)
+
+class LeaderLock:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: int | None = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+def worker_engine() -> Engine:
+    engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={'timeout': 30})
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.close()
+
+    setup_query_stats(engine)
+    return engine
+
+def listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+async def campaign(app: web.Application, lock: LeaderLock):
+    while not lock.acquire():
+        await asyncio.sleep(LEADER_RETRY_INTERVAL)
+
+    logger.info('Worker %d is the leader and runs the periodic jobs', os.getpid())
+    await app['scheduler'].start(app)
+
+def run_worker(sock: socket.socket | None, lock_path: str):
+    engine = worker_engine()
+    lock = LeaderLock(lock_path)
+    loop = asyncio.new_event_loop()
+
+    with Session(engine) as session:
+        app = create_app(session)
+
+        async def start_campaign(app: web.Application):
+            app['leader_campaign'] = asyncio.create_task(campaign(app, lock))
+
+        async def stop_campaign(app: web.Application):
+            app['leader_campaign'].cancel()
+            await app['scheduler'].stop(app)
+            lock.release()
+
+        app.on_startup.append(start_campaign)
+        app.on_cleanup.append(stop_campaign)
+
+        if sock is None:
+            web.run_app(app, host=HOST, port=PORT, reuse_port=True, shutdown_timeout=SHUTDOWN_TIMEOUT, print=None, loop=loop)
+        else:
+            web.run_app(app, sock=sock, shutdown_timeout=SHUTDOWN_TIMEOUT, print=None, loop=loop)
+
+    engine.dispose()
+
+class Supervisor:
+
+    def __init__(
+        self,
+        workers: int = WORKERS or os.cpu_count() or 1,
+        reuse_port: bool = WORKERS_REUSE_PORT,
+        lock_path: str = LEADER_LOCK_PATH,
+        shutdown_timeout: float = SHUTDOWN_TIMEOUT
+    ):
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.lock_path = lock_path
+        self.shutdown_timeout = shutdown_timeout
+        self.stopping = False
+        self._sock: socket.socket | None = None
+        self._children: dict[int, float] = {}
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(self._sock, self.lock_path)
+            except BaseException:
+                logger.exception('Worker %d failed', os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+
+        self._children[pid] = time.monotonic()
+        logger.info('Started worker %d', pid)
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info('Received %s, draining %d workers', signal.Signals(signum).name, len(self._children))
+        self._signal_children(signal.SIGTERM)
+
+    def _signal_children(self, signum: int):
+        for pid in self._children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> list[tuple[int, int, float]]:
+        exited = []
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                break
+            if pid == 0:
+                break
+            started_at = self._children.pop(pid, None)
+            if started_at is not None:
+                exited.append((pid, os.waitstatus_to_exitcode(status), time.monotonic() - started_at))
+        return exited
+
+    def run(self):
+        engine = create_engine(f"sqlite:///{DB_PATH}")
+        upgrade_schema(engine)
+        engine.dispose()
+
+        if not self.reuse_port:
+            self._sock = listen(HOST, PORT)
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            for pid, code, uptime in self._reap():
+                logger.warning('Worker %d exited with code %d after %.1fs', pid, code, uptime)
+                if self.stopping:
+                    break
+                if uptime < WORKER_MIN_UPTIME:
+                    time.sleep(WORKER_MIN_UPTIME)
+                self.spawn()
+            time.sleep(0.1)
+
+        deadline = time.monotonic() + self.shutdown_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            for pid, code, uptime in self._reap():
+                logger.info('Worker %d stopped with code %d', pid, code)
+            time.sleep(0.1)
+
+        if self._children:
+            logger.warning('Killing %d workers that did not drain in time', len(self._children))
+            self._signal_children(signal.SIGKILL)
+            while self._children:
+                self._reap()
+                time.sleep(0.1)
+
+        if self._sock is not None:
+            self._sock.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(process)d %(levelname)s %(name)s: %(message)s')
+    Supervisor().run()
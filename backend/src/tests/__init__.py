@@ -0,0 +1,9 @@
+from os import environ
+from tempfile import mkdtemp
+
+environ.setdefault('TREEBOOK_STATIC_PATH', mkdtemp())
+environ.setdefault('TREEBOOK_ADMIN_TOKEN', 'test-admin-token')
+
+import querystats
+
+querystats.STRICT = True
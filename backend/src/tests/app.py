@@ -0,0 +1,60 @@
+from os import path
+from tempfile import mkdtemp
+from unittest import IsolatedAsyncioTestCase
+
+import aiohttp
+from aiohttp import web
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from main import create_app
+from models import Genre
+from querystats import setup_query_stats
+from schema import upgrade_schema
+
+PASSWORD = 'passw0rd1'
+
+class AppTestCase(IsolatedAsyncioTestCase):
+
+    busy_timeout = 5.0
+
+    async def asyncSetUp(self):
+        self.db_path = path.join(mkdtemp(), 'test.db')
+        self.engine = create_engine(f"sqlite:///{self.db_path}", connect_args={'timeout': self.busy_timeout})
+        upgrade_schema(self.engine)
+        setup_query_stats(self.engine)
+
+        self.session = Session(self.engine)
+        genre = Genre(name='Fantasy')
+        self.session.add(genre)
+        self.session.commit()
+        self.genre_id = genre.id.hex
+
+        self.app = create_app(self.session)
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = aiohttp.ClientSession(f'http://127.0.0.1:{port}')
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+        self.session.close()
+        self.engine.dispose()
+
+    async def register(self, username: str) -> dict[str, str]:
+        response = await self.client.post('/register_user', data={'username': username, 'password': PASSWORD})
+        self.assertEqual(response.status, 201, response.reason)
+        return {'Authorization': response.headers['Authorization']}
+
+    async def create_book(self, headers: dict[str, str], title: str = 'Title', text: str = 'First page') -> tuple[str, str]:
+        form = aiohttp.FormData(default_to_multipart=True)
+        form.add_field('title', title)
+        form.add_field('text', text)
+        form.add_field('genre_id', self.genre_id)
+        response = await self.client.post('/book', data=form, headers=headers)
+        self.assertEqual(response.status, 201, response.reason)
+        body = await response.json()
+        return body['book_id'].replace('-', ''), body['first_page_id'].replace('-', '')
@@ -0,0 +1,96 @@
+from base64 import b64encode
+
+import aiohttp
+from sqlalchemy import select
+
+from models import User, Page
+from tests.app import AppTestCase, PASSWORD
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+FB2 = '''<?xml version="1.0" encoding="utf-8"?>
+<FictionBook xmlns="http://www.gribuser.ru/xml/fictionbook/2.0" xmlns:l="http://www.w3.org/1999/xlink">
+<description><title-info><book-title>Imported</book-title><coverpage><image l:href="#cover.png"/></coverpage></title-info></description>
+<body><section><p>{text}</p></section></body>
+<binary id="cover.png" content-type="image/png">{cover}</binary>
+</FictionBook>'''
+
+class HandlerBudgetTest(AppTestCase):
+
+    async def assertStatus(self, response, status: int):
+        self.assertEqual(response.status, status, f'{response.method} {response.url.path}: {response.reason}')
+
+    async def test_auth_and_books(self):
+        await self.register('alice')
+        response = await self.client.post('/login_user', data={'username': 'alice', 'password': PASSWORD})
+        await self.assertStatus(response, 200)
+        headers = {'Authorization': response.headers['Authorization']}
+
+        book_id, page_id = await self.create_book(headers)
+
+        for url in (
+            f'/book?book_id={book_id}',
+            f'/page?page_id={page_id}',
+            '/books?order_by=likes_count&desc=1',
+            '/books?order_by=trending&count=1',
+            f'/pages?next_for_f={page_id}&count=1',
+            '/books?stream=1',
+            '/genres',
+            '/sync'
+        ):
+            await self.assertStatus(await self.client.get(url, headers=headers), 200)
+
+    async def test_pages_and_likes(self):
+        alice = await self.register('alice')
+        bob = await self.register('bob')
+        book_id, page_id = await self.create_book(alice)
+
+        response = await self.client.post('/page', data={'prev_page_id': page_id, 'text': 'Next page'}, headers=bob)
+        await self.assertStatus(response, 201)
+
+        for path, data in (('/book/like', {'book_id': book_id}), ('/page/like', {'page_id': page_id})):
+            await self.assertStatus(await self.client.post(path, data=data, headers=bob), 200)
+            await self.assertStatus(await self.client.post(path, data=data, headers=bob), 200)
+
+        response = await self.client.get(f'/likes/mine?book_ids={book_id}&page_ids={page_id}', headers=bob)
+        await self.assertStatus(response, 200)
+        self.assertEqual(len((await response.json())['book_ids']), 1)
+        await self.assertStatus(await self.client.get('/books?include_my_like=1', headers=bob), 200)
+
+        for path, data in (('/book/like', {'book_id': book_id}), ('/page/like', {'page_id': page_id})):
+            await self.assertStatus(await self.client.delete(path, data=data, headers=bob), 200)
+
+    async def test_follows_feed_and_bookmarks(self):
+        alice = await self.register('alice')
+        bob = await self.register('bob')
+        author_id = self.session.scalar(select(User.id).where(User.username == 'alice')).hex
+
+        await self.assertStatus(await self.client.post('/follow', data={'author_id': author_id}, headers=bob), 200)
+        book_id, page_id = await self.create_book(alice)
+        await self.assertStatus(await self.client.get('/feed', headers=bob), 200)
+
+        await self.assertStatus(await self.client.post('/bookmark', data={'page_id': page_id}, headers=bob), 202)
+        await self.assertStatus(await self.client.get('/bookmarks', headers=bob), 200)
+        await self.assertStatus(await self.client.get('/history', headers=bob), 200)
+
+        await self.assertStatus(await self.client.delete('/follow', data={'author_id': author_id}, headers=bob), 200)
+
+    async def test_create_book_from_file(self):
+        alice = await self.register('alice')
+        text = 'Many words in a long book. ' * (Page.MAX_LENGTH // 4)
+
+        for file_type, data, title in (
+            ('txt', text.encode(), 'Imported'),
+            ('fb2', FB2.format(text=text, cover=b64encode(PNG).decode()).encode(), None)
+        ):
+            form = aiohttp.FormData(default_to_multipart=True)
+            form.add_field('book', data, filename=f'book.{file_type}')
+            if title:
+                form.add_field('title', title)
+            response = await self.client.post(f'/book/from_file/{file_type}', data=form, headers=alice)
+            await self.assertStatus(response, 201)
+
+            book_id = (await response.json())['book_id']
+            response = await self.client.get(f'/pages?book_id_f={book_id.replace("-", "")}&count=1&limit=200')
+            await self.assertStatus(response, 200)
+            self.assertGreater(int(response.headers['X-Total-Count']), 5)
@@ -0,0 +1,65 @@
+import gzip
+import json
+from os import urandom
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import aiohttp
+from aiohttp import web
+
+from compression import ResponseCompressor, COMPRESSORS, negotiate
+
+LARGE = json.dumps([{'id': index, 'title': f'Book {index}'} for index in range(200)]).encode()
+
+class NegotiateTest(TestCase):
+
+    def test_negotiate(self):
+        preferred = next(iter(COMPRESSORS))
+        self.assertEqual(negotiate('gzip'), 'gzip')
+        self.assertEqual(negotiate('GZIP, deflate'), 'gzip')
+        self.assertEqual(negotiate('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('*'), preferred)
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate('gzip;q=x'))
+
+class CompressorMiddlewareTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.compressor = ResponseCompressor()
+        app = web.Application(middlewares=[self.compressor.middleware])
+        app.router.add_get('/large', lambda request: web.Response(body=LARGE, content_type='application/json'))
+        app.router.add_get('/small', lambda request: web.Response(body=b'[]', content_type='application/json'))
+        app.router.add_get('/random', lambda request: web.Response(body=urandom(4096), content_type='application/json'))
+        app.router.add_get('/image', lambda request: web.Response(body=LARGE, content_type='image/png'))
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = aiohttp.ClientSession(f'http://127.0.0.1:{port}', auto_decompress=False)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def test_negotiated_encodings(self):
+        for _ in range(2):
+            for accept, coding in (('gzip', 'gzip'), ('identity', None), ('gzip;q=0', None)):
+                response = await self.client.get('/large', headers={'Accept-Encoding': accept})
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.headers.get('Content-Encoding'), coding, accept)
+                self.assertIn('Accept-Encoding', response.headers.getall('Vary'), accept)
+
+                body = await response.read()
+                self.assertEqual(gzip.decompress(body) if coding == 'gzip' else body, LARGE, accept)
+        self.assertEqual(self.compressor.misses, 1)
+        self.assertEqual(self.compressor.hits, 1)
+
+    async def test_skips_small_incompressible_and_binary_bodies(self):
+        for url, vary in (('/small', False), ('/random', True), ('/image', False)):
+            response = await self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.status, 200)
+            self.assertNotIn('Content-Encoding', response.headers, url)
+            self.assertEqual('Accept-Encoding' in response.headers.getall('Vary', []), vary, url)
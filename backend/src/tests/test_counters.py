@@ -0,0 +1,28 @@
+import sqlite3
+from unittest.mock import patch
+
+from sqlalchemy import delete
+
+from models import Counter
+from tests.app import AppTestCase
+
+class ReadCounterTest(AppTestCase):
+
+    async def test_seeding_leaves_the_shared_session_alone(self):
+        headers = await self.register('alice')
+        book_id, _ = await self.create_book(headers)
+        await self.create_book(headers, title='Second')
+
+        self.session.execute(delete(Counter))
+        self.session.commit()
+
+        with patch.object(self.session, 'commit', side_effect=AssertionError('read_counter committed the shared session')):
+            for url, total in (('/books?count=1', '2'), (f'/pages?book_id_f={book_id}&count=1', '1')):
+                response = await self.client.get(url)
+                self.assertEqual(response.status, 200, url)
+                self.assertEqual(response.headers['X-Total-Count'], total, url)
+
+        with sqlite3.connect(self.db_path) as connection:
+            seeded = dict(connection.execute('SELECT key, value FROM counters'))
+        self.assertEqual(seeded['books'], 2)
+        self.assertEqual(seeded[f'pages:book_id={book_id}'], 1)
@@ -0,0 +1,14 @@
+from unittest import TestCase
+
+from benchmarks.dataset import DatasetGenerator
+
+class DatasetGeneratorTest(TestCase):
+
+    def test_last_pages_have_no_continuation(self):
+        generator = DatasetGenerator(users=10, books=20, pages_per_book=200, branching=0.5, page_length=60, likes=0)
+        pages = list(generator.page_rows())
+
+        last = {page['id'] for page in pages if page['last']}
+        self.assertTrue(last)
+        self.assertFalse([page['id'] for page in pages if page['previous_page_id'] in last])
+        self.assertEqual(sum(page['first'] for page in pages), generator.books)
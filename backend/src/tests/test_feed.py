@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from os import path
+from tempfile import mkdtemp
+from unittest import TestCase
+from uuid import uuid4
+
+from sqlalchemy import create_engine, select, update, func
+from sqlalchemy.orm import Session
+
+from config import FEED_FANOUT_LIMIT
+from feed import follow, publish_post, read_feed, feed_trim
+from models import User, FeedItem, Change
+from schema import upgrade_schema
+
+class FeedTest(TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(f"sqlite:///{path.join(mkdtemp(), 'test.db')}")
+        upgrade_schema(self.engine)
+        self.session = Session(self.engine)
+        self.author, self.reader = User(username='author', password='x'), User(username='reader', password='x')
+        self.session.add_all([self.author, self.reader])
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def test_pages_stay_full_after_an_author_stops_fanning_out(self):
+        follow(self.session, self.reader.id, self.author.id)
+        posts = [uuid4() for _ in range(10)]
+        for entity_id in posts:
+            publish_post(self.session, self.author.id, Change.BOOK, entity_id)
+        self.session.execute(update(User).where(User.id == self.author.id).values(followers_count=FEED_FANOUT_LIMIT + 1))
+        self.session.commit()
+
+        feed = read_feed(self.session, self.reader.id, None, 5)
+        self.assertEqual([item.entity_id for item in feed], posts[:4:-1])
+
+        feed = read_feed(self.session, self.reader.id, feed[-1].created_at, 5)
+        self.assertEqual([item.entity_id for item in feed], posts[4::-1])
+
+    def test_trim_keeps_the_newest_items_per_user(self):
+        now = datetime.now()
+        for user, count in ((self.reader, 7), (self.author, 2)):
+            self.session.add_all(
+                FeedItem(user_id=user.id, author_id=self.author.id, kind=Change.BOOK, entity_id=uuid4(), created_at=now - timedelta(minutes=minute))
+                for minute in range(count)
+            )
+        self.session.commit()
+
+        self.assertEqual(feed_trim(self.engine, max_items=3, batch_size=2), 4)
+
+        counts = dict(self.session.execute(select(FeedItem.user_id, func.count()).group_by(FeedItem.user_id)).all())
+        self.assertEqual(counts, {self.reader.id: 3, self.author.id: 2})
+        oldest = self.session.scalar(select(func.min(FeedItem.created_at)).where(FeedItem.user_id == self.reader.id))
+        self.assertEqual(oldest, now - timedelta(minutes=2))
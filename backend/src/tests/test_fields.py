@@ -0,0 +1,35 @@
+from tests.app import AppTestCase
+
+class FieldsTest(AppTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.headers = await self.register('alice')
+        self.book_id, self.page_id = await self.create_book(self.headers)
+
+    async def test_known_fields_are_selected(self):
+        for url, expected in (
+            (f'/book?book_id={self.book_id}&fields=title,author,image_path', {'id', 'title', 'author', 'image_path'}),
+            (f'/page?page_id={self.page_id}&fields=text,book_title', {'id', 'text', 'book_title'}),
+            ('/books?fields=title,likes_count', {'id', 'title', 'likes_count'}),
+            ('/bookmarks?fields=title', {'id', 'title', 'resume_page_id', 'read_at'})
+        ):
+            response = await self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status, 200, url)
+            body = await response.json()
+            rows = body if isinstance(body, list) else [body]
+            for row in rows:
+                self.assertEqual(set(row), expected, url)
+
+    async def test_unknown_fields_are_rejected(self):
+        for url in (
+            f'/book?book_id={self.book_id}&fields=title,titel',
+            f'/page?page_id={self.page_id}&fields=genre',
+            '/books?fields=password_hash,title',
+            '/books?fields=nope&stream=1',
+            '/pages?fields=first_page_id&count=1',
+            '/bookmarks?fields=resume_page_id'
+        ):
+            response = await self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status, 400, url)
+            self.assertEqual(response.reason, 'INVALID_FIELDS', url)
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from genres import parse_etags, etag_matches
+from tests.app import AppTestCase
+
+class EntityTagTest(TestCase):
+
+    def test_parse_etags(self):
+        self.assertEqual(parse_etags('"a"'), ['"a"'])
+        self.assertEqual(parse_etags('W/"a", "b,c" ,W/""'), ['W/"a"', '"b,c"', 'W/""'])
+        self.assertEqual(parse_etags('*'), ['*'])
+        self.assertEqual(parse_etags(' "a", , "b",'), ['"a"', '"b"'])
+        self.assertEqual(parse_etags('"a" "b"'), [])
+        self.assertEqual(parse_etags('a'), [])
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"x", W/"abc"', 'W/"abc"'))
+        self.assertTrue(etag_matches('"abc"', 'W/"abc"'))
+        self.assertTrue(etag_matches('*', 'W/"abc"'))
+        self.assertFalse(etag_matches('W/"abcd"', 'W/"abc"'))
+        self.assertFalse(etag_matches('W/"abc"x', 'W/"abc"'))
+        self.assertFalse(etag_matches('', 'W/"abc"'))
+
+class GenresConditionalTest(AppTestCase):
+
+    async def test_if_none_match(self):
+        response = await self.client.get('/genres', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status, 200)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        for header, status in (
+            (etag, 304),
+            (f'"other", {etag}', 304),
+            (etag.removeprefix('W/'), 304),
+            ('*', 304),
+            (f'W/"other"', 200),
+            (etag[:-2] + '"', 200)
+        ):
+            for coding in ('gzip', 'identity'):
+                response = await self.client.get('/genres', headers={'If-None-Match': header, 'Accept-Encoding': coding})
+                self.assertEqual(response.status, status, (header, coding))
+                self.assertEqual(response.headers['ETag'], etag)
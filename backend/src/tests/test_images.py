@@ -0,0 +1,116 @@
+import errno
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from os import path
+from tempfile import mkdtemp
+from unittest.mock import AsyncMock, patch
+from uuid import UUID
+
+import aiohttp
+from sqlalchemy import select, update
+
+from cleanups import images_cleanup
+from config import IMAGE_CACHE_CONTROL, IMAGE_FALLBACK_CACHE_CONTROL
+from models import Book, Image
+from tests.app import AppTestCase
+from variants import VariantGenerator, UndecodableImage
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+class FailingExecutor(Executor):
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_exception(self.error)
+        return future
+
+class ImageTestCase(AppTestCase):
+
+    async def create_book_with_cover(self, headers: dict[str, str], cover: bytes) -> str:
+        form = aiohttp.FormData(default_to_multipart=True)
+        form.add_field('title', 'Covered')
+        form.add_field('text', 'First page')
+        form.add_field('cover', cover, filename='cover.png', content_type='image/png')
+        response = await self.client.post('/book', data=form, headers=headers)
+        self.assertEqual(response.status, 201, response.reason)
+        return (await response.json())['book_id'].replace('-', '')
+
+    def image_exists(self, image: Image) -> bool:
+        return path.exists(self.app['images'].full_path(image.path))
+
+class ImagesCleanupTest(ImageTestCase):
+
+    async def test_collects_only_unreferenced_images(self):
+        headers = await self.register('alice')
+        first = await self.create_book_with_cover(headers, PNG)
+        second = await self.create_book_with_cover(headers, PNG)
+
+        storage = self.app['images']
+        orphan = await storage.save_bytes(self.session, PNG + b'orphan')
+        legacy = Image(path='user_images/legacy.png')
+        self.session.add(legacy)
+        self.session.commit()
+
+        covers = set(self.session.scalars(select(Book.cover_image_id).where(Book.id.in_([UUID(first), UUID(second)]))))
+        self.assertEqual(len(covers), 1)
+        cover = self.session.get(Image, covers.pop())
+        orphan_id, orphan_path = orphan.id, storage.full_path(orphan.path)
+        self.assertTrue(path.exists(orphan_path))
+
+        images_cleanup(self.engine, storage, self.app['variants'])
+        self.session.expire_all()
+        self.assertIsNotNone(self.session.get(Image, orphan_id))
+
+        self.session.execute(update(Image).values(created_at=datetime.now() - timedelta(days=1)))
+        self.session.commit()
+        images_cleanup(self.engine, storage, self.app['variants'])
+        self.session.expire_all()
+
+        self.assertIsNone(self.session.get(Image, orphan_id))
+        self.assertFalse(path.exists(orphan_path))
+        self.assertIsNotNone(self.session.get(Image, cover.id))
+        self.assertTrue(self.image_exists(cover))
+        self.assertIsNotNone(self.session.get(Image, legacy.id))
+
+class ImageVariantTest(ImageTestCase):
+
+    async def test_fallback_is_not_cached_as_the_variant(self):
+        headers = await self.register('alice')
+        book_id = await self.create_book_with_cover(headers, PNG)
+        image_id = self.session.scalar(select(Book.cover_image_id).where(Book.id == UUID(book_id)))
+
+        response = await self.client.get(f'/image/{image_id}')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Cache-Control'], IMAGE_CACHE_CONTROL)
+
+        variants = self.app['variants']
+        for available in (False, True):
+            with patch.object(VariantGenerator, 'available', available), patch.object(variants, 'get', AsyncMock(return_value=None)):
+                response = await self.client.get(f'/image/{image_id}?w=160')
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.headers['Cache-Control'], IMAGE_FALLBACK_CACHE_CONTROL)
+                self.assertEqual(await response.read(), PNG)
+
+        for width in ('0', '-1', '\u00b2', 'abc'):
+            response = await self.client.get(f'/image/{image_id}', params={'w': width})
+            self.assertEqual(response.status, 400, width)
+
+    async def test_only_decode_errors_are_remembered(self):
+        variants = VariantGenerator(root=mkdtemp())
+        for error, remembered in (
+            (BrokenProcessPool(), False),
+            (OSError(errno.ENOSPC, 'No space left on device'), False),
+            (UndecodableImage('cannot identify image file'), True)
+        ):
+            key = type(error).__name__
+            variants._executor = FailingExecutor(error)
+            self.assertIsNone(await variants.get('source.png', key, 160))
+            self.assertEqual(key in variants._failed, remembered, key)
+
+        variants._executor = FailingExecutor(BrokenProcessPool())
+        await variants.get('source.png', 'broken', 160)
+        self.assertIsNone(variants._executor)
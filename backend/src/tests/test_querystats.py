@@ -0,0 +1,47 @@
+from unittest import IsolatedAsyncioTestCase
+
+from aiohttp.web_response import Response
+from sqlalchemy import create_engine, text
+
+import querystats
+from querystats import query_budget, count_queries, setup_query_stats, QueryBudgetExceeded
+
+class QueryBudgetTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        setup_query_stats(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def handler(self, queries: int):
+        async def run_queries(request):
+            with self.engine.connect() as connection:
+                for _ in range(queries):
+                    connection.execute(text('select 1'))
+            return Response(status=200)
+        return run_queries
+
+    async def test_within_budget(self):
+        response = await query_budget(2, strict=True)(self.handler(2))(None)
+        self.assertEqual(response.status, 200)
+
+    async def test_over_budget_raises_when_strict(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            await query_budget(1, strict=True)(self.handler(2))(None)
+
+    async def test_over_budget_warns_when_not_strict(self):
+        with self.assertLogs('querystats', 'WARNING'):
+            response = await query_budget(1, strict=False)(self.handler(2))(None)
+        self.assertEqual(response.status, 200)
+
+    async def test_strict_by_default_in_tests(self):
+        self.assertTrue(querystats.STRICT)
+        with self.assertRaises(QueryBudgetExceeded):
+            await query_budget(0)(self.handler(1))(None)
+
+    async def test_nested_counts_propagate(self):
+        with count_queries() as outer:
+            await query_budget(5, strict=True)(self.handler(3))(None)
+        self.assertEqual(outer.count, 3)
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from time import sleep
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+from uuid import uuid4
+
+from reading import ReadingTracker
+
+class ReadingTrackerTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tracker = ReadingTracker(interval=3600)
+        self.tracker._engine = object()
+        self.batches = []
+
+    async def test_flushes_never_overlap(self):
+        running = 0
+        overlapped = False
+        lock = threading.Lock()
+
+        def flush_progress(engine, bookmarks, history):
+            nonlocal running, overlapped
+            with lock:
+                running += 1
+                overlapped = overlapped or running > 1
+            sleep(0.05)
+            with lock:
+                running -= 1
+            self.batches.append(bookmarks)
+
+        with patch('reading.flush_progress', flush_progress):
+            self.tracker.record(uuid4(), uuid4(), uuid4())
+            first = asyncio.ensure_future(self.tracker.flush())
+            await asyncio.sleep(0.01)
+            self.tracker.record(uuid4(), uuid4(), uuid4())
+            await asyncio.gather(first, self.tracker.flush(), self.tracker.flush())
+
+        self.assertFalse(overlapped)
+        self.assertEqual([len(batch) for batch in self.batches], [1, 1])
+        self.assertEqual(self.tracker.written, 2)
+        self.assertIsNone(self.tracker._flushing)
+
+    async def test_stop_keeps_a_batch_whose_flush_was_cancelled_and_failed(self):
+        release = threading.Event()
+        attempts = 0
+
+        def flush_progress(engine, bookmarks, history):
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                release.wait(5)
+                raise OSError('disk I/O error')
+            self.batches.append(bookmarks)
+
+        with patch('reading.flush_progress', flush_progress):
+            self.tracker.record(uuid4(), uuid4(), uuid4())
+            self.tracker._task = asyncio.ensure_future(self.tracker.flush())
+            await asyncio.sleep(0.01)
+            asyncio.get_running_loop().call_later(0.05, release.set)
+            await self.tracker.stop()
+
+        self.assertEqual(attempts, 2)
+        self.assertEqual([len(batch) for batch in self.batches], [1])
+        self.assertEqual(self.tracker.written, 1)
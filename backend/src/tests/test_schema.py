@@ -0,0 +1,99 @@
+import sqlite3
+from os import path
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.orm import Session
+
+from models import Base, User, Book, Image, Like, Follow
+from schema import upgrade_schema
+
+LEGACY_SCHEMA = '''
+CREATE TABLE users (
+    id CHAR(32) NOT NULL, username VARCHAR(50) NOT NULL, password VARCHAR NOT NULL,
+    PRIMARY KEY (id), UNIQUE (username)
+);
+CREATE TABLE genres (id CHAR(32) NOT NULL, name VARCHAR(50) NOT NULL, PRIMARY KEY (id));
+CREATE TABLE images (id CHAR(32) NOT NULL, path VARCHAR(200) NOT NULL, PRIMARY KEY (id));
+CREATE TABLE tokens (
+    id CHAR(32) NOT NULL, active BOOLEAN NOT NULL, user_id CHAR(32) NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE TABLE books (
+    id CHAR(32) NOT NULL, title VARCHAR(100) NOT NULL, author_id CHAR(32) NOT NULL, genre_id CHAR(32),
+    created_at DATETIME NOT NULL, cover_image_id CHAR(32),
+    PRIMARY KEY (id), FOREIGN KEY(author_id) REFERENCES users (id),
+    FOREIGN KEY(genre_id) REFERENCES genres (id), FOREIGN KEY(cover_image_id) REFERENCES images (id)
+);
+CREATE TABLE pages (
+    id CHAR(32) NOT NULL, text VARCHAR(10000) NOT NULL, book_id CHAR(32) NOT NULL, first BOOLEAN NOT NULL,
+    last BOOLEAN NOT NULL, previous_page_id CHAR(32), author_id CHAR(32) NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(book_id) REFERENCES books (id),
+    FOREIGN KEY(previous_page_id) REFERENCES pages (id), FOREIGN KEY(author_id) REFERENCES users (id)
+);
+CREATE TABLE likes (
+    user_id CHAR(32) NOT NULL, book_id CHAR(32) NOT NULL, page_id CHAR(32) NOT NULL,
+    PRIMARY KEY (user_id, book_id, page_id), FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(book_id) REFERENCES books (id), FOREIGN KEY(page_id) REFERENCES pages (id)
+);
+INSERT INTO users VALUES ('a' || hex(zeroblob(15)) || '1', 'alice', 'x'), ('b' || hex(zeroblob(15)) || '2', 'bob', 'x');
+INSERT INTO images VALUES ('c' || hex(zeroblob(15)) || '3', 'user_images/legacy.png');
+INSERT INTO books VALUES ('d' || hex(zeroblob(15)) || '4', 'Legacy', 'a' || hex(zeroblob(15)) || '1', NULL, '2020-01-01 00:00:00.000000', 'c' || hex(zeroblob(15)) || '3');
+INSERT INTO likes VALUES ('b' || hex(zeroblob(15)) || '2', 'd' || hex(zeroblob(15)) || '4', hex(zeroblob(16)));
+'''
+
+class UpgradeSchemaTest(TestCase):
+
+    def setUp(self):
+        self.db_path = path.join(mkdtemp(), 'legacy.db')
+        with sqlite3.connect(self.db_path) as connection:
+            connection.executescript(LEGACY_SCHEMA)
+        self.engine = create_engine(f'sqlite:///{self.db_path}')
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def assertMatchesModels(self):
+        inspector = inspect(self.engine)
+        for table in Base.metadata.sorted_tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            self.assertEqual(columns, set(table.columns.keys()), table.name)
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            self.assertLessEqual({index.name for index in table.indexes}, indexes, table.name)
+
+    def test_upgrades_a_legacy_database(self):
+        upgrade_schema(self.engine)
+        upgrade_schema(self.engine)
+        self.assertMatchesModels()
+
+        with Session(self.engine) as session:
+            alice = session.scalar(select(User).where(User.username == 'alice'))
+            bob = session.scalar(select(User).where(User.username == 'bob'))
+            self.assertEqual(alice.followers_count, 0)
+
+            book = session.scalar(select(Book))
+            self.assertEqual(book.trending_score, 0.0)
+            self.assertIsNone(session.scalar(select(Like.created_at)))
+
+            image = session.get(Image, book.cover_image_id)
+            self.assertIsNone(image.digest)
+            self.assertIsNotNone(image.created_at)
+
+            session.add_all([Follow(follower_id=bob.id, author_id=alice.id), Image(path='user_images/new.png', digest='0' * 64)])
+            session.commit()
+
+    def test_backfills_followers_and_drops_reference_count(self):
+        with sqlite3.connect(self.db_path) as connection:
+            connection.executescript('''
+                ALTER TABLE images ADD COLUMN reference_count INTEGER NOT NULL DEFAULT 0;
+                CREATE TABLE follows (follower_id CHAR(32) NOT NULL, author_id CHAR(32) NOT NULL, created_at DATETIME NOT NULL, PRIMARY KEY (follower_id, author_id));
+                INSERT INTO follows SELECT b.id, a.id, '2020-01-01 00:00:00.000000' FROM users a, users b WHERE a.username = 'alice' AND b.username = 'bob';
+            ''')
+
+        upgrade_schema(self.engine)
+        self.assertMatchesModels()
+
+        with Session(self.engine) as session:
+            self.assertEqual(session.scalar(select(User.followers_count).where(User.username == 'alice')), 1)
+            self.assertEqual(session.scalar(select(User.followers_count).where(User.username == 'bob')), 0)
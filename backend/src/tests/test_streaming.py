@@ -0,0 +1,83 @@
+import json
+import sqlite3
+from unittest import mock
+
+from aiohttp.web_response import StreamResponse
+
+import handlers
+from tests.app import AppTestCase
+
+def concurrent_writer(db_path: str, errors: list[str]):
+    class WritingResponse(StreamResponse):
+        async def write(self, data: bytes):
+            connection = sqlite3.connect(db_path, timeout=0.2)
+            try:
+                connection.execute("insert into genres (id, name) values (lower(hex(randomblob(16))), 'Concurrent')")
+                connection.commit()
+            except sqlite3.OperationalError as error:
+                errors.append(str(error))
+            finally:
+                connection.close()
+            return await super().write(data)
+    return WritingResponse
+
+class StreamRowsTest(AppTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.headers = await self.register('alice')
+        self.books = [await self.create_book(self.headers, title=f'Book {title}') for title in 'CAEGBDF']
+
+    async def lines(self, url: str) -> list[dict]:
+        response = await self.client.get(url)
+        self.assertEqual(response.status, 200, response.reason)
+        return [json.loads(line) for line in (await response.text()).splitlines()]
+
+    async def listed(self, url: str) -> list[dict]:
+        response = await self.client.get(url)
+        self.assertEqual(response.status, 200, response.reason)
+        return await response.json()
+
+    async def test_batches_match_the_plain_list(self):
+        with mock.patch.object(handlers, 'STREAM_BATCH_SIZE', 2):
+            for query in (
+                'order_by=created_at',
+                'order_by=title&desc=1',
+                'order_by=title&offset=2&limit=3',
+                'order_by=created_at&desc=1&offset=1&limit=5',
+                'order_by=title&fields=title'
+            ):
+                streamed = await self.lines(f'/books?stream=1&{query}')
+                self.assertEqual(streamed, await self.listed(f'/books?{query}'), query)
+
+            streamed = await self.lines('/books?stream=1')
+            self.assertEqual(len(streamed), len(self.books))
+            self.assertEqual(len({book['id'] for book in streamed}), len(self.books))
+
+    async def test_no_transaction_is_held_between_batches(self):
+        errors = []
+        with mock.patch.object(handlers, 'STREAM_BATCH_SIZE', 2), mock.patch.object(handlers, 'StreamResponse', concurrent_writer(self.db_path, errors)):
+            streamed = await self.lines('/books?stream=1&order_by=title')
+
+        self.assertEqual(len(streamed), len(self.books))
+        self.assertEqual(errors, [])
+
+class FailedCommitTest(AppTestCase):
+
+    busy_timeout = 0.1
+
+    async def test_shared_session_recovers_after_a_failed_commit(self):
+        headers = await self.register('alice')
+        book_id, page_id = await self.create_book(headers)
+
+        lock = sqlite3.connect(self.db_path)
+        lock.execute('begin immediate')
+        response = await self.client.post('/page', data={'prev_page_id': page_id, 'text': 'Blocked'}, headers=headers)
+        self.assertEqual(response.status, 500)
+        lock.rollback()
+        lock.close()
+
+        response = await self.client.post('/page', data={'prev_page_id': page_id, 'text': 'Next'}, headers=headers)
+        self.assertEqual(response.status, 201, response.reason)
+        response = await self.client.get(f'/book?book_id={book_id}')
+        self.assertEqual(response.status, 200, response.reason)
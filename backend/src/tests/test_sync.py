@@ -0,0 +1,12 @@
+from tests.app import AppTestCase
+
+class SyncCursorTest(AppTestCase):
+
+    async def test_rejects_invalid_cursors(self):
+        for since in ('²', '-1', 'x', ''):
+            response = await self.client.get('/sync', params={'since': since})
+            self.assertEqual(response.status, 400, since)
+            self.assertEqual(response.reason, 'INVALID_CURSOR', since)
+
+        response = await self.client.get('/sync', params={'since': '0'})
+        self.assertEqual(response.status, 200)
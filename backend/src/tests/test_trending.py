@@ -0,0 +1,45 @@
+from os import path
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+
+from models import User, Book, Counter
+from schema import upgrade_schema
+from trending import TrendingDecay, DECAYED_AT_KEY
+
+class TrendingDecayTest(TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(f"sqlite:///{path.join(mkdtemp(), 'test.db')}")
+        upgrade_schema(self.engine)
+        self.session = Session(self.engine)
+        author = User(username='alice', password='x')
+        self.book = Book(title='Title', author=author, trending_score=8.0)
+        self.session.add(self.book)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def score(self) -> float:
+        self.session.expire_all()
+        return self.session.scalar(select(Book.trending_score).where(Book.id == self.book.id))
+
+    def test_decays_time_elapsed_since_the_last_recorded_run(self):
+        decay = TrendingDecay(half_life=1000, interval=1000, floor=0.0)
+        decay(self.engine)
+        self.assertAlmostEqual(self.score(), 4.0)
+
+        self.session.execute(update(Counter).where(Counter.key == DECAYED_AT_KEY).values(value=Counter.value - 2000))
+        self.session.commit()
+
+        TrendingDecay(half_life=1000, interval=1000, floor=0.0)(self.engine)
+        self.assertAlmostEqual(self.score(), 1.0, delta=0.01)
+
+    def test_restarted_job_does_not_decay_twice(self):
+        TrendingDecay(half_life=1000, interval=1000, floor=0.0)(self.engine)
+        TrendingDecay(half_life=1000, interval=1000, floor=0.0)(self.engine)
+        self.assertAlmostEqual(self.score(), 4.0, delta=0.01)
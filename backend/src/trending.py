@@ -0,0 +1,80 @@
+from datetime import datetime
+from math import exp, log
+from time import time
+from uuid import UUID
+
+from sqlalchemy import select, update, case, func, Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import TRENDING_HALF_LIFE, TRENDING_DECAY_INTERVAL, TRENDING_FLOOR
+from models import Book, Page, Counter
+
+TRENDING_MODELS = (Book, Page)
+
+DECAYED_AT_KEY = 'trending:decayed_at'
+
+def like_weight(created_at: datetime | None, half_life: float = TRENDING_HALF_LIFE) -> float:
+    if created_at is None:
+        return 0.0
+    age = max((datetime.now() - created_at).total_seconds(), 0.0)
+    return exp(-age * log(2) / half_life)
+
+def add_trending(session: Session, Model: type[Book] | type[Page], id: UUID, delta: float):
+    if delta:
+        session.execute(
+            update(Model)
+            .where(Model.id == id)
+            .values(trending_score=func.max(Model.trending_score + delta, 0.0))
+        )
+
+class TrendingDecay:
+
+    def __init__(self, half_life: float = TRENDING_HALF_LIFE, interval: float = TRENDING_DECAY_INTERVAL, floor: float = TRENDING_FLOOR):
+        self.half_life = half_life
+        self.interval = interval
+        self.floor = floor
+        self.last_factor: float | None = None
+        self.last_updated = 0
+        self.last_run_at: float | None = None
+
+    def claim(self, session: Session, now: int) -> float | None:
+        previous = session.scalar(select(Counter.value).where(Counter.key == DECAYED_AT_KEY))
+        if previous is None:
+            statement = sqlite_insert(Counter).values(key=DECAYED_AT_KEY, value=now).on_conflict_do_nothing()
+            return self.interval if session.execute(statement).rowcount else None
+
+        statement = update(Counter).where(Counter.key == DECAYED_AT_KEY, Counter.value == previous).values(value=now)
+        return max(now - previous, 0) if session.execute(statement).rowcount else None
+
+    def __call__(self, engine: Engine):
+        now = int(time())
+        updated = 0
+        with Session(engine) as session:
+            elapsed = self.claim(session, now)
+            if elapsed is None:
+                return
+
+            factor = exp(-elapsed * log(2) / self.half_life)
+            for Model in TRENDING_MODELS:
+                decayed = Model.trending_score * factor
+                updated += session.execute(
+                    update(Model)
+                    .where(Model.trending_score > 0)
+                    .values(trending_score=case((decayed < self.floor, 0.0), else_=decayed))
+                ).rowcount
+            session.commit()
+
+        self.last_factor = factor
+        self.last_updated = updated
+        self.last_run_at = time()
+
+    def as_dict(self) -> dict:
+        return {
+            'half_life': self.half_life,
+            'last_factor': self.last_factor,
+            'last_updated': self.last_updated,
+            'last_run_at': self.last_run_at
+        }
+
+trending_decay = TrendingDecay()
@@ -1,5 +1,5 @@
 from uuid import UUID
-from models import Page
+from models import Base, Page
 
 def validate_password(password: str):
     if not password: return False
@@ -29,8 +29,12 @@ def validate_page_text(text: str):
         return False
     return True
 
+def validate_fields(Model: type[Base], fields: set[str] | None):
+    if fields is None: return True
+    return fields <= Model.field_names()
+
 def safe_convert_to_uuid(uuid: str):
     try:
         return UUID(hex=uuid)
-    except ValueError and TypeError:
+    except (ValueError, TypeError):
         return UUID(int=0)
\ No newline at end of file
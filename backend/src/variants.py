@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os import makedirs, path, remove, replace, getpid
+
+from config import STATIC_PATH, IMAGES_FOLDER, IMAGE_VARIANTS_FOLDER, IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_WORKERS
+from models import Image
+
+try:
+    from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+except ImportError:
+    PILImage = None
+
+logger = logging.getLogger(__name__)
+
+class UndecodableImage(Exception):
+    pass
+
+def render_variant(source: str, target: str, width: int, quality: int):
+    try:
+        opened = PILImage.open(source)
+    except UnidentifiedImageError as error:
+        raise UndecodableImage(str(error)) from None
+
+    with opened as image:
+        try:
+            image.draft('RGB', (width, width))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, image.height))
+
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGBA')
+                background = PILImage.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+        except OSError as error:
+            if error.errno is not None:
+                raise
+            raise UndecodableImage(str(error)) from None
+        except Exception as error:
+            raise UndecodableImage(str(error)) from None
+
+        makedirs(path.dirname(target), exist_ok=True)
+        temp_name = f'{target}.{getpid()}.tmp'
+        image.save(temp_name, 'JPEG', quality=quality, optimize=True, progressive=True)
+        replace(temp_name, target)
+
+class VariantGenerator:
+
+    def __init__(
+        self,
+        root: str = STATIC_PATH,
+        folder: str = f'{IMAGES_FOLDER}/{IMAGE_VARIANTS_FOLDER}',
+        widths: tuple[int, ...] = IMAGE_VARIANT_WIDTHS,
+        workers: int = IMAGE_VARIANT_WORKERS
+    ):
+        self.root = root
+        self.folder = folder
+        self.widths = tuple(sorted(widths))
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._failed: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def available(self) -> bool:
+        return PILImage is not None and bool(self.widths)
+
+    def pick_width(self, requested: int) -> int:
+        for width in self.widths:
+            if width >= requested:
+                return width
+        return self.widths[-1]
+
+    @staticmethod
+    def key(image: Image) -> str:
+        return image.digest or image.id.hex
+
+    def relative_path(self, key: str, width: int) -> str:
+        return '/'.join((self.folder, key[:2], key[2:4], f'{key}_{width}.jpg'))
+
+    def full_path(self, relative_path: str) -> str:
+        return path.join(self.root, *relative_path.split('/'))
+
+    async def get(self, source: str, key: str, width: int) -> str | None:
+        target = self.full_path(self.relative_path(key, width))
+
+        if key in self._failed:
+            return None
+        if path.exists(target):
+            return target
+
+        future = self._pending.get(target)
+        if future is None:
+            future = self._pending[target] = asyncio.ensure_future(self._render(source, key, target, width))
+            future.add_done_callback(lambda _: self._pending.pop(target, None))
+
+        return target if await asyncio.shield(future) else None
+
+    async def _render(self, source: str, key: str, target: str, width: int) -> bool:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        executor = self._executor
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                executor, render_variant, source, target, width, IMAGE_VARIANT_QUALITY
+            )
+        except UndecodableImage:
+            logger.warning('Could not decode %s, serving the original', source, exc_info=True)
+            self._failed.add(key)
+            return False
+        except BrokenProcessPool:
+            logger.warning('Variant workers died while rendering %s at %dpx', source, width, exc_info=True)
+            if self._executor is executor:
+                executor.shutdown(wait=False)
+                self._executor = None
+            return False
+        except Exception:
+            logger.warning('Could not render %s at %dpx, serving the original', source, width, exc_info=True)
+            return False
+        return True
+
+    def schedule(self, source: str, key: str):
+        if not self.available:
+            return
+
+        for width in self.widths:
+            task = asyncio.ensure_future(self.get(source, key, width))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def remove(self, key: str):
+        self._failed.discard(key)
+        for width in self.widths:
+            try:
+                remove(self.full_path(self.relative_path(key, width)))
+            except FileNotFoundError:
+                pass
+
+    async def close(self, app):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,4 +1,5 @@
 const String API_BASE_URL = "localhost";
 const int API_PORT = 80;
 const String API_STATIC_PATH = "static";
-const String API_ROOT = "localhost:80";
\ No newline at end of file
+const String API_ROOT = "localhost:80";
+const int COVER_THUMBNAIL_WIDTH = 320;
\ No newline at end of file
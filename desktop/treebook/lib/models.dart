@@ -1,11 +1,12 @@
 class Book {
-  const Book({required this.id, required this.title, required this.author, required this.firstPageId, this.genre, this.imagePath});
+  const Book({required this.id, required this.title, required this.author, required this.firstPageId, this.genre, this.imagePath, this.coverImageId});
   
   final String id;
   final String title;
   final User author;
   final Genre? genre;
   final String? imagePath;
+  final String? coverImageId;
   final String firstPageId;
 
   factory Book.fromJson(Map<String, dynamic> json) {
@@ -18,7 +19,8 @@ class Book {
         'first_page_id': String firstPageId,
         'genre_id': String? genreId,
         'genre': String? genre,
-        'image_path': String? imagePath
+        'image_path': String? imagePath,
+        'cover_image_id': String? coverImageId
       } =>
         Book(
           id: id,
@@ -33,6 +35,7 @@ class Book {
             name: genre
           ) : null,
           imagePath: imagePath,
+          coverImageId: coverImageId,
         ),
       _ => throw const FormatException('Failed to parse book.'),
     };
@@ -3,7 +3,7 @@ import 'package:provider/provider.dart';
 import 'package:treebook/genres.dart';
 
 import '../models.dart' show Book, Genre;
-import '../config.dart' show API_BASE_URL, API_PORT, API_STATIC_PATH;
+import '../config.dart' show API_BASE_URL, API_PORT, API_STATIC_PATH, COVER_THUMBNAIL_WIDTH;
 import '../client.dart' show ApiClient;
 import 'basics.dart';
 import 'page.dart';
@@ -45,8 +45,8 @@ class _BookGridItemState extends State<BookGridItem> {
             mainAxisAlignment: MainAxisAlignment.spaceBetween,
             children: [
               Flexible(
-                child: widget.book.imagePath == null ? Center(child: Icon(Icons.image)) : Image.network(
-                  'http://$API_BASE_URL:$API_PORT/$API_STATIC_PATH/${widget.book.imagePath}',
+                child: widget.book.coverImageId == null ? Center(child: Icon(Icons.image)) : Image.network(
+                  'http://$API_BASE_URL:$API_PORT/image/${widget.book.coverImageId}?w=$COVER_THUMBNAIL_WIDTH',
                   frameBuilder: (context, child, frame, loaded) => Center(child: child),
                 ),
               ),